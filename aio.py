@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+import checker
+
+# Проверка из asyncio-кода (веб-сервис приёма работ): цикл событий не блокируется ни чтением
+# загрузки, ни разбором документа. Сама проверка идёт в executor (по умолчанию - пул процессов),
+# одновременно - не больше limit проверок, остальные ждут своей очереди, не читая загрузку.
+#
+#     checks = AsyncChecker(limit=4, timeout=30)
+#     errors = await checks.check(request.content)
+#
+# или разово: errors = await check_async(path)
+
+# больше этого документ из потока не читается
+MAX_SIZE = 64 * 1024 * 1024
+# по сколько байт читать асинхронный поток
+CHUNK = 64 * 1024
+# сколько ждать сверх timeout, если проверка застряла там, где не проверяет отмену (распаковка)
+GRACE = 5.0
+
+
+class TooLarge(ValueError):
+    pass
+
+
+# выполняется в executor: отмена по истечении timeout проверяется по ходу обхода тела
+def check_source(source, disabled=(), cache=None, timeout: float | None = None) -> list[checker.Error]:
+    cancelled = None
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        cancelled = lambda: time.monotonic() > deadline
+    check = checker.StyleChecker(source, streaming=True, cache=cache, cancelled=cancelled, disabled=disabled)
+    try:
+        return check.run()
+    except checker.Cancelled:
+        raise TimeoutError(f"check took longer than {timeout} s") from None
+
+
+# содержимое асинхронного потока: объект с async read(n) (aiohttp.StreamReader, asyncio.StreamReader)
+# или асинхронный итератор по кускам bytes
+async def read_stream(stream, max_size: int = MAX_SIZE) -> bytes:
+    data = bytearray()
+    if hasattr(stream, "read"):
+        while chunk := await stream.read(CHUNK):
+            data += chunk
+            if len(data) > max_size:
+                raise TooLarge(f"document is larger than {max_size} bytes")
+    else:
+        async for chunk in stream:
+            data += chunk
+            if len(data) > max_size:
+                raise TooLarge(f"document is larger than {max_size} bytes")
+    return bytes(data)
+
+
+def is_async_stream(source) -> bool:
+    return hasattr(source, "__aiter__") or (hasattr(source, "read") and asyncio.iscoroutinefunction(source.read))
+
+
+class AsyncChecker:
+    executor: object | None
+    limit: int
+    timeout: float | None
+    cache: object | None
+    max_size: int
+
+    # executor - concurrent.futures.Executor; None - свой пул из limit процессов, создаётся при первой проверке
+    def __init__(self, executor=None, limit: int | None = None, timeout: float | None = None, cache=None,
+                 max_size: int = MAX_SIZE):
+        self.limit = limit or os.cpu_count() or 1
+        self.executor = executor
+        self.owned = executor is None
+        self.timeout = timeout
+        self.cache = cache
+        self.max_size = max_size
+        self.semaphore = asyncio.Semaphore(self.limit)
+
+    # source - путь, bytes, файлоподобный объект или асинхронный поток; timeout - на эту проверку
+    # вместо общего, истёкший - TimeoutError. Ошибки разбора документа - те же, что у StyleChecker.run
+    async def check(self, source, disabled=(), timeout: float | None = None) -> list[checker.Error]:
+        timeout = self.timeout if timeout is None else timeout
+        async with self.semaphore:
+            if is_async_stream(source):
+                source = await read_stream(source, self.max_size)
+            elif hasattr(source, "read"):
+                # обычный файл процессу пула не передать, да и читать его в цикле событий нельзя
+                source = await asyncio.to_thread(source.read)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.__executor(), check_source, source, tuple(disabled), self.cache,
+                                          timeout)
+            if timeout is None:
+                return await future
+            return await asyncio.wait_for(future, timeout + GRACE)
+
+    def __executor(self):
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.limit)
+        return self.executor
+
+    def close(self):
+        if self.owned and self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self.close)
+
+
+default = None
+
+
+# проверка через общий AsyncChecker с настройками по умолчанию
+async def check_async(source, disabled=(), timeout: float | None = None) -> list[checker.Error]:
+    global default
+    if default is None:
+        default = AsyncChecker()
+    return await default.check(source, disabled, timeout)
@@ -1,15 +1,58 @@
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QFileDialog, \
     QLineEdit, QListView, QStackedWidget, QDialog, QLabel, QMessageBox, \
-    QVBoxLayout, QWidget, QTreeWidget, QTreeWidgetItem
+    QVBoxLayout, QWidget, QTreeView, QComboBox, QCheckBox
+import os
 import sys
+import batch
 import checker
-from widgets import CenteredMessageBox
+import report
+import watch
+from widgets import CenteredMessageBox, ErrorModel, WordWrapDelegate
+
+# проверка в отдельном потоке, чтобы окно не зависало на больших файлах
+class CheckThread(QThread):
+    progress = pyqtSignal(int)
+    found = pyqtSignal(object)
+
+    def __init__(self, watcher: watch.Watcher, parent=None):
+        super().__init__(parent)
+        self.watcher = watcher
+        self.path = watcher.path
+        self.cancelled = False
+        self.failure = None
+        self.change = None
+
+    # проверка помнит прошлую (watcher), поэтому повторная проверяет только изменившееся
+    def run(self):
+        stamp = self.watcher.modified()
+        check = self.watcher.new_check(progress=self.progress.emit, cancelled=self.isInterruptionRequested)
+        try:
+            for error in check.iter_errors():
+                self.found.emit(error)
+        except checker.Cancelled:
+            self.cancelled = True
+            return
+        except Exception as exc:
+            self.failure = batch.describe_failure(exc)
+        else:
+            self.change = self.watcher.finish(check.all_errors)
+        # и после неудачи: иначе таймер запускал бы проверку того же файла снова и снова
+        if stamp is not None:
+            self.watcher.stamp = stamp
+
 
 class MainWindow(QMainWindow):
-    errorTree: QTreeWidget
+    errorTree: QTreeView
+    errorModel: ErrorModel
     file: str
     text: str
+    worker: CheckThread | None
+    watcher: watch.Watcher | None
+    processed: int
+    found: list[checker.Error]
+    shown: list[checker.Error]
+    recheck: bool
 
     def __init__(self):
         super().__init__()
@@ -18,22 +61,63 @@ class MainWindow(QMainWindow):
         self.setFixedSize(QSize(700, 800))
         self.file = ""
         self.text = ""
+        self.worker = None
+        self.watcher = None
+        self.processed = 0
+        self.found = []
+        self.shown = []
+        self.recheck = False
 
         layout = QVBoxLayout()
 
-        select_button = QPushButton("Выбрать файл для проверки")
-        select_button.setCheckable(True)
-        select_button.clicked.connect(self.push_select_file_buttom)
+        self.select_button = QPushButton("Выбрать файл для проверки")
+        self.select_button.setCheckable(True)
+        self.select_button.clicked.connect(self.push_select_file_buttom)
+
+        self.cancel_button = QPushButton("Отменить проверку")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.push_cancel_button)
 
         save_button = QPushButton("Сохранить исправления в файл")
         save_button.setCheckable(True)
         save_button.clicked.connect(self.push_save_file_button)
 
-        self.errorTree = QTreeWidget()
-        self.errorTree.setHeaderLabel("Файл не выбран")
+        self.errorModel = ErrorModel(self)
+        self.errorTree = QTreeView()
+        self.errorTree.setModel(self.errorModel)
+        self.errorTree.setItemDelegate(WordWrapDelegate(self.errorTree))
+        self.errorTree.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        self.errorFilter = QComboBox()
+        self.errorFilter.addItem("Все ошибки", None)
+        for kind in checker.ErrorType:
+            self.errorFilter.addItem(kind.pretty(), kind)
+        self.errorFilter.currentIndexChanged.connect(
+            lambda: self.errorModel.setFilter(self.errorFilter.currentData()))
 
-        layout.addWidget(select_button)
+        # группы собираются, когда проверка закончена; до этого список пуст
+        self.groupMode = QComboBox()
+        self.groupMode.addItem("Все ошибки по порядку", None)
+        self.groupMode.addItem("Группировать по стилю", "style")
+        self.groupMode.addItem("Группировать по правилу", "rule")
+        self.groupMode.currentIndexChanged.connect(self.show_errors)
+
+        self.status = QLabel("")
+
+        # после каждого сохранения файла проверка запускается заново
+        self.watchToggle = QCheckBox("Следить за изменениями файла")
+        self.watchToggle.toggled.connect(self.toggle_watch)
+        self.watchTimer = QTimer(self)
+        self.watchTimer.setInterval(int(watch.INTERVAL * 1000))
+        self.watchTimer.timeout.connect(self.poll_file)
+
+        layout.addWidget(self.select_button)
+        layout.addWidget(self.cancel_button)
         layout.addWidget(save_button)
+        layout.addWidget(self.watchToggle)
+        layout.addWidget(self.status)
+        layout.addWidget(self.errorFilter)
+        layout.addWidget(self.groupMode)
         layout.addWidget(self.errorTree)
 
         widget = QWidget()
@@ -42,19 +126,11 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(widget)
 
     def push_select_file_buttom(self):
-        file = getOpenFilesAndDirs(filter='(*.odt)')
+        file = getOpenFilesAndDirs(filter='(*.odt *.fodt)')
         if len(file) == 1:
-            self.file = file[0][file[0].rfind("/") + 1 : file[0].find('.odt')]
-            errors = checker.StyleChecker(file[0]).run()
-            if len(errors) == 0:
-                self.text = "все верно"
-            else:
-                self.text = ""
-                for error in errors:
-                    self.text += error.pretty() + "\n"
-            self.errorTree.clear()
-            self.errorTree.setHeaderLabel(self.file)
-            self.listErrors(errors)
+            self.watcher = watch.Watcher(file[0])
+            self.errorModel.setHeader(document_name(file[0]))
+            self.start_check()
             return
 
         elif len(file) == 0:
@@ -62,18 +138,95 @@ class MainWindow(QMainWindow):
         else: 
             popup("Выберите один файл")
 
-    def listErrors(self, errors: list[checker.Error]):
-        def wordWrapLabel(text: str) -> QLabel:
-            label = QLabel(text)
-            label.setWordWrap(True)
-            return label
+    # повторная проверка того же файла (слежение за изменениями) показывает, как и main.py --watch,
+    # только новые и исправленные ошибки, поэтому список меняется, когда она закончится
+    def start_check(self):
+        self.recheck = self.watcher.errors is not None
+        self.file = ""
+        self.text = ""
+        self.processed = 0
+        self.found = []
+        if not self.recheck:
+            self.errorModel.clear()
+        self.status.setText("Идёт проверка...")
+
+        self.worker = CheckThread(self.watcher, self)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.found.connect(self.add_error)
+        self.worker.finished.connect(self.check_finished)
+        self.select_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.worker.start()
 
+    def toggle_watch(self, enabled: bool):
+        if enabled:
+            self.watchTimer.start()
+        else:
+            self.watchTimer.stop()
+
+    def poll_file(self):
+        if self.worker is None and self.watcher is not None and self.watcher.modified() is not None:
+            self.start_check()
+
+    def push_cancel_button(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.cancel_button.setEnabled(False)
+            self.watchToggle.setChecked(False)
+
+    def show_progress(self, processed: int):
+        self.processed = processed
+        self.status.setText(f"Проверено элементов: {processed}")
+
+    def add_error(self, error: checker.Error):
+        self.text += error.pretty() + "\n"
+        self.found.append(error)
+        if not self.recheck and self.groupMode.currentData() is None:
+            self.listErrors([error])
+
+    def show_errors(self):
+        if self.worker is not None:
+            return
+        group = self.groupMode.currentData()
+        if group is None:
+            self.errorModel.reset(self.shown)
+        else:
+            self.errorModel.reset(report.group_errors(self.found, group))
+
+    def check_finished(self):
+        worker = self.worker
+        self.worker = None
+        self.select_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if worker.cancelled:
+            self.status.setText("Проверка отменена")
+            return
+        if worker.failure is not None:
+            self.status.setText(worker.failure)
+            # при слежении файл, скорее всего, ещё сохраняется: проверка повторится, когда он изменится
+            if not self.watchToggle.isChecked() or self.watcher.errors is None:
+                popup(worker.failure)
+            return
+        if worker.change.first:
+            self.shown = self.found
+        else:
+            self.shown = marked("Новая ошибка: ", worker.change.added) + \
+                marked("Исправлено: ", worker.change.resolved)
+        if not worker.change.first or self.groupMode.currentData() is not None:
+            self.show_errors()
+        if worker.change.first:
+            self.status.setText(f"Проверка завершена, проверено элементов: {self.processed}")
+        else:
+            self.status.setText(f"Проверка завершена: новых ошибок {len(worker.change.added)}, "
+                                f"исправлено {len(worker.change.resolved)}, "
+                                f"проверено элементов: {self.processed}")
+        self.file = document_name(worker.path)
+        if self.text == "":
+            self.text = "все верно"
+
+    def listErrors(self, errors: list[checker.Error]):
         for errorLine in errors:
-            lineEntry = QTreeWidgetItem(self.errorTree)
-            self.errorTree.setItemWidget(lineEntry, 0, wordWrapLabel(errorLine.text))
-            for errorDescription in errorLine.errors:
-                errorEntry = QTreeWidgetItem(lineEntry)
-                self.errorTree.setItemWidget(errorEntry, 0, wordWrapLabel(errorDescription.pretty()))
+            self.errorModel.append(errorLine)
 
     def push_save_file_button(self):
         if self.file == "":
@@ -91,6 +244,15 @@ def popup(text):
     messageBox.setStyleSheet("QLabel{min-width: 140px;}")
     messageBox.exec()
 
+# копии ошибок с пометкой перед текстом места, для списка изменений после повторной проверки
+def marked(label, errors):
+    return [checker.Error(label + error.text, error.mask, error.style, error.position, error.xpath)
+            for error in errors]
+
+# имя файла без каталога и расширения (.odt или .fodt)
+def document_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
 def getOpenFilesAndDirs(parent=None, caption='', directory='', 
                         filter='', initialFilter='', options=None):
     def updateText():
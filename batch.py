@@ -0,0 +1,128 @@
+import hashlib
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from functools import partial
+import checker
+import loader
+
+
+@dataclass
+class Result:
+    path: str
+    errors: list[checker.Error]
+    failure: str | None
+    stats: checker.Stats | None = None
+    # sha256 содержимого файла, если его просили посчитать (hashed)
+    digest: str | None = None
+
+
+@dataclass
+class Summary:
+    files: int
+    with_errors: int
+    failed: int
+    seconds: float
+
+    def pretty(self) -> str:
+        rate = self.files / self.seconds if self.seconds > 0 else 0.0
+        return f"Проверено файлов: {self.files}, с ошибками: {self.with_errors}, " \
+               f"не удалось проверить: {self.failed}\n" \
+               f"Время: {self.seconds:.2f} с, {rate:.1f} файлов/с"
+
+
+# раскрывает каталоги (рекурсивно) и шаблоны в отсортированный список файлов .odt и .fodt;
+# пути, которые ни на что не указывают, остаются как есть - их ошибку покажет check_file
+def describe_failure(exc: Exception) -> str:
+    match exc:
+        case FileNotFoundError() | IsADirectoryError():
+            return "Файл не существует."
+        case PermissionError():
+            return "Нет доступа к файлу."
+        case zipfile.BadZipFile() | loader.NotDocument():
+            return "Файл не является ODT-документом."
+        case loader.MissingPart():
+            return f"В файле нет {exc.member}. С вашим ODF-файлом что-то не так."
+        case ET.ParseError():
+            return f"content.xml повреждён: {exc}"
+        case TimeoutError():
+            return "Проверка не уложилась в отведённое время."
+        case _:
+            return f"Ошибка при проверке: {type(exc).__name__}: {exc}"
+
+
+def file_digest(path: str, source: bytes | None = None) -> str | None:
+    if source is not None:
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+# source - содержимое файла, если оно уже в памяти (например, пришло по сети), иначе читается path;
+# hashed - посчитать и хеш содержимого (для store.py); style_profile - см. checker.StyleChecker
+def check_file(path: str, cache=None, profile: bool = False, disabled=(), source=None, hashed: bool = False,
+               style_profile: checker.StyleProfile | None = None) -> Result:
+    if not path.endswith(loader.EXTENSIONS):
+        return Result(path, [], "Файл имеет неверное расширение.")
+    check = checker.StyleChecker(path if source is None else source, streaming=True, cache=cache,
+                                 profile=profile, disabled=disabled, style_profile=style_profile)
+    try:
+        result = Result(path, check.run(), None, check.stats if profile else None)
+    except Exception as exc:
+        return Result(path, [], describe_failure(exc))
+    if hashed:
+        result.digest = file_digest(path, source)
+    return result
+
+
+# Ошибки одного файла по мере проверки (StyleChecker.iter_errors), попутно собираются в result.
+# Если файл не удалось проверить, перебор заканчивается, в result - причина и ни одной ошибки.
+# Исключения у того, кто перебирает (запись в поток вывода, BrokenPipeError после | head),
+# ошибками проверки файла не считаются и уходят ему же.
+def stream_errors(errors, result: Result):
+    while True:
+        try:
+            error = next(errors)
+        except StopIteration:
+            return
+        except Exception as exc:
+            result.errors = []
+            result.failure = describe_failure(exc)
+            return
+        result.errors.append(error)
+        yield error
+
+
+# результаты отдаются в порядке files, независимо от того, какой процесс закончил раньше
+# профиль уходит в процессы пула вместе с заданием, а готовится к сравнению в каждом из них один раз
+def check_files(files: list[str], jobs: int | None = None, cache=None, profile: bool = False, disabled=(),
+                hashed: bool = False, style_profile: checker.StyleProfile | None = None):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(files))
+    check = partial(check_file, cache=cache, profile=profile, disabled=disabled, hashed=hashed,
+                    style_profile=style_profile)
+    if jobs <= 1:
+        yield from map(check, files)
+        return
+    # пул процессов тянет за собой multiprocessing и logging - одному файлу он не нужен
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(check, files, chunksize=max(1, len(files) // (jobs * 4)))
+
+
+def summarize(results: list[Result], seconds: float) -> Summary:
+    return Summary(
+        files = len(results),
+        with_errors = sum(1 for result in results if result.errors),
+        failed = sum(1 for result in results if result.failure is not None),
+        seconds = seconds,
+    )
+
@@ -0,0 +1,3 @@
+# Замеры скорости и памяти StyleChecker на синтетических документах:
+#   python3 -m benchmarks.generate out.odt --pages 100   - создать документ
+#   python3 -m benchmarks.run --output bench.json        - прогнать замеры
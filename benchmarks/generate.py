@@ -0,0 +1,203 @@
+import argparse
+import io
+import random
+import struct
+import zipfile
+import zlib
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+NAMESPACES = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+    'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+    'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0" '
+    'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" '
+    'xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"'
+)
+
+WORDS = ("курсовая работа посвящена анализу методов оформления текстовых документов "
+         "согласно требованиям стандарта при этом рассматриваются шрифты отступы поля "
+         "списки рисунки таблицы и заголовки разделов").split()
+
+# примерно столько элементов тела приходится на страницу текста
+BLOCKS_PER_PAGE = 8
+
+
+# доли видов элементов тела документа
+@dataclass
+class Mix:
+    paragraphs: float = 0.55
+    headers: float = 0.08
+    bullet_lists: float = 0.07
+    numbered_lists: float = 0.07
+    images: float = 0.08
+    tables: float = 0.05
+    annotations: float = 0.05
+    table_depth: int = 2
+    styles: int = 12
+
+
+def png(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\0" + b"\xff" * (width * 3) for _ in range(height))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) \
+        + chunk(b"pHYs", struct.pack(">IIB", 11811, 11811, 1)) \
+        + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+class Generator:
+    def __init__(self, mix: Mix, seed: int):
+        self.mix = mix
+        self.random = random.Random(seed)
+        self.images = 0
+
+    def words(self, count: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(count))
+
+    def automatic_styles(self) -> str:
+        styles = []
+        for i in range(1, self.mix.styles + 1):
+            good = i % 3 != 0
+            styles.append(
+                f'<style:style style:name="P{i}" style:family="paragraph" style:parent-style-name="Text_20_body">'
+                f'<style:paragraph-properties fo:margin-left="{"-1.75cm" if good else "0cm"}" '
+                f'fo:margin-right="-1.85cm" fo:text-indent="1.251cm" '
+                f'fo:text-align="{"justify" if good or i % 2 else "start"}" '
+                f'fo:padding-top="0.199cm" fo:padding-bottom="0.199cm"/>'
+                f'<style:text-properties style:font-name="{"Times New Roman" if good else "Arial"}" '
+                f'fo:font-size="{"14pt" if i % 4 else "12pt"}" fo:color="#000000"/></style:style>')
+        styles.append('<style:style style:name="MP1" style:family="paragraph" style:master-page-name="First_20_Page"/>')
+        styles.append('<text:list-style style:name="L1"><text:list-level-style-bullet text:level="1" '
+                      'text:bullet-char="•"/></text:list-style>')
+        styles.append('<text:list-style style:name="L2"><text:list-level-style-number text:level="1" '
+                      'style:num-format="1"/></text:list-style>')
+        return "".join(styles)
+
+    def style(self) -> str:
+        return f"P{self.random.randint(1, self.mix.styles)}"
+
+    def paragraph(self, text: str | None = None) -> str:
+        if text is None:
+            text = escape(self.words(self.random.randint(8, 40)))
+            if self.random.random() < self.mix.annotations:
+                text += '<office:annotation><dc:creator>рецензент</dc:creator>' \
+                        f'<text:p>{escape(self.words(4))}</text:p></office:annotation>'
+        return f'<text:p text:style-name="{self.style()}">{text}</text:p>'
+
+    def header(self) -> str:
+        number = f"{self.random.randint(1, 9)}.{self.random.randint(1, 9)}"
+        dot = "." if self.random.random() < 0.2 else ""
+        return f'<text:h text:style-name="{self.style()}" text:outline-level="2">' \
+               f'{number} {escape(self.words(3).capitalize())}{dot}</text:h>'
+
+    def list(self, bullet: bool) -> str:
+        items = []
+        count = self.random.randint(2, 6)
+        for i in range(count):
+            text = self.words(self.random.randint(2, 8))
+            if not bullet or i == 0:
+                text = text.capitalize()
+            text += "," if bullet and i != count - 1 else "."
+            items.append(f'<text:list-item>{self.paragraph(escape(text))}</text:list-item>')
+        return f'<text:list text:style-name="{"L1" if bullet else "L2"}">{"".join(items)}</text:list>'
+
+    def image(self) -> str:
+        self.images += 1
+        frame = f'<draw:frame draw:name="Рисунок{self.images}" text:anchor-type="as-char" ' \
+                f'svg:width="12cm" svg:height="8cm"><draw:image xlink:href="Pictures/image{self.images % 4}.png" ' \
+                f'xlink:type="simple" xlink:show="embed" xlink:actuate="onLoad"/></draw:frame>'
+        caption = f"рисунок {self.random.randint(1, 9)}.{self.images} - {self.words(3)}"
+        return self.paragraph("") + self.paragraph(frame) + self.paragraph("") + self.paragraph(escape(caption))
+
+    def table(self, depth: int = 0) -> str:
+        rows = []
+        columns = self.random.randint(2, 4)
+        for _ in range(self.random.randint(2, 5)):
+            cells = []
+            for _ in range(columns):
+                if depth + 1 < self.mix.table_depth and self.random.random() < 0.1:
+                    inner = self.table(depth + 1)
+                else:
+                    inner = self.paragraph(escape(self.words(self.random.randint(1, 5))))
+                cells.append(f'<table:table-cell office:value-type="string">{inner}</table:table-cell>')
+            rows.append(f'<table:table-row>{"".join(cells)}</table:table-row>')
+        return f'<table:table table:name="Таблица"><table:table-column table:number-columns-repeated="{columns}"/>' \
+               f'{"".join(rows)}</table:table>'
+
+    def block(self) -> str:
+        kinds = [
+            (self.mix.paragraphs, self.paragraph),
+            (self.mix.headers, self.header),
+            (self.mix.bullet_lists, lambda: self.list(True)),
+            (self.mix.numbered_lists, lambda: self.list(False)),
+            (self.mix.images, self.image),
+            (self.mix.tables, self.table),
+        ]
+        point = self.random.random() * sum(weight for weight, _ in kinds)
+        for weight, make in kinds:
+            point -= weight
+            if point < 0:
+                return make()
+        return self.paragraph()
+
+    def content(self, pages: int) -> str:
+        body = ['<text:table-of-content text:name="Оглавление"><text:index-body>'
+                + self.paragraph("Оглавление") + '</text:index-body></text:table-of-content>']
+        for _ in range(pages * BLOCKS_PER_PAGE):
+            body.append(self.block())
+        return f'<?xml version="1.0" encoding="UTF-8"?><office:document-content {NAMESPACES} office:version="1.3">' \
+               f'<office:font-face-decls/><office:automatic-styles>{self.automatic_styles()}</office:automatic-styles>' \
+               f'<office:body><office:text>{"".join(body)}</office:text></office:body></office:document-content>'
+
+
+STYLES = f'''<?xml version="1.0" encoding="UTF-8"?><office:document-styles {NAMESPACES} office:version="1.3">
+<office:styles>
+<style:default-style style:family="paragraph"><style:text-properties style:font-name="Liberation Serif" fo:font-size="12pt"/></style:default-style>
+<style:style style:name="Standard" style:family="paragraph"/>
+<style:style style:name="Text_20_body" style:family="paragraph" style:parent-style-name="Standard"/>
+<style:style style:name="Footer" style:family="paragraph" style:parent-style-name="Standard"/>
+</office:styles>
+<office:automatic-styles>
+<style:style style:name="MP2" style:family="paragraph" style:parent-style-name="Footer"><style:paragraph-properties fo:text-align="center"/></style:style>
+</office:automatic-styles>
+</office:document-styles>'''
+
+MANIFEST = f'''<?xml version="1.0" encoding="UTF-8"?><manifest:manifest {NAMESPACES} manifest:version="1.3">
+<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>
+<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>'''
+
+
+def generate(pages: int, mix: Mix | None = None, seed: int = 0) -> bytes:
+    generator = Generator(mix or Mix(), seed)
+    content = generator.content(pages)
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.text", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/manifest.xml", MANIFEST)
+        archive.writestr("content.xml", content)
+        archive.writestr("styles.xml", STYLES)
+        for i in range(min(generator.images, 4)):
+            archive.writestr(f"Pictures/image{i}.png", png(64 * (i + 1), 48 * (i + 1)), compress_type=zipfile.ZIP_STORED)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический ODT-документ для замеров")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with open(args.output, "wb") as file:
+        file.write(generate(args.pages, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
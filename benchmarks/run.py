@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import checker
+import loader
+from benchmarks.generate import generate
+
+ENGINES = {"tree": False, "stream": True}
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def unzip_time(data: bytes) -> float:
+    start = time.perf_counter()
+    with loader.Document(data) as document:
+        for name in (loader.CONTENT, loader.STYLES):
+            document.read(name)
+    return time.perf_counter() - start
+
+
+def measure(data: bytes, streaming: bool, repeat: int, memory: bool, profile: bool) -> dict:
+    best = None
+    for _ in range(repeat):
+        check = checker.StyleChecker(data, streaming=streaming, profile=profile)
+        start = time.perf_counter()
+        errors = check.run()
+        total = time.perf_counter() - start
+        if best is None or total < best["total"]:
+            best = {
+                "total": total,
+                "stats": check.stats.as_dict(),
+                "elements": check.processed,
+                "errors": len(errors),
+            }
+    if memory:
+        tracemalloc.start()
+        checker.StyleChecker(data, streaming=streaming).run()
+        best["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры StyleChecker на синтетических документах")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов, берётся лучшее время")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пиковую память (tracemalloc)")
+    parser.add_argument("--profile", action="store_true", help="добавить замеры по правилам (замедляет проверку)")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию - stdout)")
+    args = parser.parse_args()
+
+    results = []
+    for pages in args.pages:
+        data = generate(pages, seed=args.seed)
+        unzip = min(unzip_time(data) for _ in range(args.repeat))
+        for engine in args.engines:
+            result = {"pages": pages, "engine": engine, "bytes": len(data), "unzip": unzip}
+            result.update(measure(data, ENGINES[engine], args.repeat, not args.no_memory, args.profile))
+            results.append(result)
+            print(f"{pages:>6} стр. {engine:>6}: {result['total']:.3f} с"
+                  + (f", {result['peak_memory'] / 2**20:.1f} МБ" if "peak_memory" in result else ""),
+                  file=sys.stderr)
+
+    report = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
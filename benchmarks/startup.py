@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.generate import generate
+from benchmarks.run import commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# модули, которых не должно быть при обычной проверке одного файла: движок дерева,
+# пул процессов, HTTP-клиент (без запущенного сервера) и графическая оболочка
+FORBIDDEN = ("anytree", "concurrent.futures", "urllib.request", "PyQt5")
+
+# бюджет на импорты при холодном старте, мс
+BUDGET = 120.0
+
+
+# строки -X importtime: "import time: <своё, мкс> | <с вложенными, мкс> | <отступ><модуль>";
+# результат - (модуль, уровень вложенности, мкс с вложенными)
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        try:
+            cumulative = int(cumulative)
+        except ValueError:
+            # заголовок таблицы
+            continue
+        name = name[1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), level, cumulative))
+    return modules
+
+
+def run_once(command: list[str], env: dict[str, str]) -> tuple[float, list[tuple[str, int, int]]]:
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime"] + command, cwd=ROOT, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total = time.perf_counter() - start
+    if process.returncode not in (0, 1):
+        raise RuntimeError(f"{' '.join(command)}: код выхода {process.returncode}\n{process.stderr}")
+    return total, parse_importtime(process.stderr)
+
+
+# Холодный старт `main.py файл`: каждый запуск - новый интерпретатор, первый (он же пишет
+# .pyc и заполняет кэш результатов) не считается. Берётся лучшее время из repeat запусков.
+def measure(path: str, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, XDG_CACHE_HOME=cache)
+        command = ["main.py", path, "--no-server"]
+        run_once(command, env)
+        best = None
+        for _ in range(repeat):
+            total, modules = run_once(command, env)
+            imports = sum(cumulative for _, level, cumulative in modules if level == 0) / 1000
+            if best is None or imports < best["imports"]:
+                best = {"total": total * 1000, "imports": imports, "modules": modules}
+    modules = best.pop("modules")
+    names = {name for name, _, _ in modules}
+    best["count"] = len(names)
+    best["forbidden"] = [name for name in FORBIDDEN if name in names]
+    best["top"] = [{"module": name, "ms": cumulative / 1000}
+                   for name, _, cumulative in sorted((m for m in modules if m[1] == 0), key=lambda m: -m[2])[:10]]
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер холодного старта main.py по -X importtime")
+    parser.add_argument("path", nargs="?", help="документ (по умолчанию - синтетический на одну страницу)")
+    parser.add_argument("--repeat", type=int, default=5, help="число запусков, берётся лучший")
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help=f"допустимое время импортов, мс (по умолчанию {BUDGET:g})")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию - stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.path
+        if path is None:
+            path = os.path.join(directory, "startup.odt")
+            with open(path, "wb") as file:
+                file.write(generate(1))
+        result = measure(os.path.abspath(path), args.repeat)
+
+    report = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "budget": args.budget,
+        "result": result,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    print(f"импорты: {result['imports']:.1f} мс из {args.budget:g}, весь запуск: {result['total']:.1f} мс, "
+          f"модулей: {result['count']}", file=sys.stderr)
+    failed = False
+    if result["imports"] > args.budget:
+        print("Бюджет холодного старта превышен", file=sys.stderr)
+        failed = True
+    if len(result["forbidden"]) != 0:
+        print(f"Загружены лишние модули: {', '.join(result['forbidden'])}", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+import checker
+import loader
+
+MEMBERS = (loader.CONTENT, loader.STYLES, loader.PICTURES)
+
+
+def default_directory() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "stylechecker")
+
+
+def dump_errors(errors: list[checker.Error]) -> list[dict]:
+    return [{"text": error.text, "errors": [kind.name for kind in error.errors],
+             "style": error.style, "position": error.position, "xpath": error.xpath} for error in errors]
+
+
+def load_errors(data: list[dict]) -> list[checker.Error]:
+    return [checker.Error(item["text"], [checker.ErrorType[name] for name in item["errors"]],
+                          item.get("style"), item.get("position"), item.get("xpath")) for item in data]
+
+
+# Результаты проверки на диске: по одному json-файлу на документ, ключ - хеш content.xml,
+# styles.xml и версии правил. Время изменения файла служит меткой последнего использования,
+# при превышении max_size удаляются самые давно использованные записи.
+class ResultCache:
+    directory: str
+    max_size: int
+
+    def __init__(self, directory: str | None = None, max_size: int = 64 * 1024 * 1024):
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+
+    # rules - имена включённых правил
+    def key(self, members: dict[str, bytes], rules: str = "") -> str:
+        digest = hashlib.sha256(f"rules:{checker.RULES_VERSION}:{rules}\n".encode())
+        for name in MEMBERS:
+            data = members.get(name)
+            if data is None:
+                digest.update(f"{name}:-\n".encode())
+            else:
+                digest.update(f"{name}:{len(data)}\n".encode())
+                digest.update(data)
+        return digest.hexdigest()
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, key: str) -> list[checker.Error] | None:
+        path = self.__path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                errors = load_errors(json.load(file))
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return errors
+
+    # кэш, в который нельзя записать (нет прав, диск заполнен), просто не пополняется
+    def store(self, key: str, errors: list[checker.Error]):
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(dump_errors(errors), file, ensure_ascii=False)
+            os.replace(tmp, self.__path(key))
+        except OSError:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.__evict()
+
+    def __entries(self) -> list[os.DirEntry]:
+        try:
+            return [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def __evict(self):
+        entries = []
+        total = 0
+        for entry in self.__entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in self.__entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -1,12 +1,25 @@
-import zipfile
+import functools
+import hashlib
+import io
+import sys
+import time
 import xml.etree.ElementTree as ET
-import tempfile
-from dataclasses import dataclass
-from enum import Enum
-from anytree import NodeMixin, RenderTree
+from collections import deque
+from dataclasses import dataclass, replace
+from enum import Enum, IntFlag
+import loader
+import units
 
 
-@dataclass
+# меняется вместе с правилами проверки, чтобы не отдавать устаревшие результаты из кэша
+RULES_VERSION = 6
+
+# как часто (в элементах тела) сообщать о прогрессе и проверять отмену
+PROGRESS_STEP = 64
+
+
+# значения полей интернированы (см. style_properties): у тысяч стилей одни и те же строки
+@dataclass(frozen=True, slots=True)
 class StyleInfo:
     font: str
     size: str
@@ -18,32 +31,29 @@ class StyleInfo:
     padding_bottom: str
     color: str
 
-    def collect_errors(self):
-        errors = []
 
-        if self.font != correct_style.font:
-            errors.append(ErrorType.FONT)
-        if self.size != correct_style.size:
-            errors.append(ErrorType.FONT_SIZE)
-        if self.margin_right != correct_style.margin_right:
-            errors.append(ErrorType.MARGIN_RIGHT)
-        if self.margin_left != correct_style.margin_left:
-            errors.append(ErrorType.MARGIN_LEFT)
-        if self.text_indent != correct_style.text_indent:
-            errors.append(ErrorType.TEXT_INDENT)
-        if self.text_align != correct_style.text_align:
-            errors.append(ErrorType.ALIGNMENT)
-        if self.padding_bottom != correct_style.padding_bottom:
-            errors.append(ErrorType.LOWER_OFFSET)
-        if self.padding_top != correct_style.padding_top:
-            errors.append(ErrorType.UPPER_OFFSET)
-        if self.color != correct_style.color:
-            errors.append(ErrorType.COLOR)
-
-        return errors
+# Требования к оформлению абзацев - ожидаемые значения полей StyleInfo. Длины (поля, отступы,
+# размер шрифта) сравниваются числами с допуском, а не строками: '12.51mm' и '1.251cm' - одно и то же,
+# как и '0.2cm' и '0.199cm'. Профили кафедр задаются в файле (см. profiles.py).
+@dataclass(frozen=True)
+class StyleProfile:
+    name: str
+    font: str
+    size: str
+    margin_right: str
+    margin_left: str
+    text_indent: str
+    text_align: str
+    padding_top: str
+    padding_bottom: str
+    color: str
+    # допуск для полей и отступов, мм, и для размера шрифта, pt
+    tolerance: float = 0.1
+    size_tolerance: float = 0.1
 
 
-correct_style = StyleInfo(
+GOST_2_105 = StyleProfile(
+    name = 'gost-2.105',
     font = 'Times New Roman',
     size = '14pt',
     margin_right = '-1.85cm',
@@ -91,8 +101,11 @@ class ErrorType(Enum):
     ABSENCE_OF_FOOTER = 21
     DONT_FOOTER_ON_FIRST_PAGE = 22
     NO_TABLE_OF_CONTENTS = 23
+    IMAGE_RESOLUTION = 24
+    IMAGE_WIDTH = 25
 
-    def pretty(self) -> str:
+    # требования к абзацам берутся из профиля оформления (по умолчанию ГОСТ 2.105)
+    def pretty(self, profile: "StyleProfile | None" = None) -> str:
         match self:
             case ErrorType.ABSENCE_OF_FOOTER:
                 return 'должна присутствовать нумерация страниц снизу страницы посередине'
@@ -107,17 +120,17 @@ class ErrorType(Enum):
             case ErrorType.LAST_CHAR_IN_NUM_LIST:
                 return 'пункты нумерованного списка должны оканчиваться точкой'
             case ErrorType.FONT:
-                return 'шрифт должен быть Times New Roman'
+                return 'шрифт должен быть ' + expected(profile, 'font', 'Times New Roman')
             case ErrorType.FONT_SIZE:
-                return 'размер шрифта должен быть 14pt'
+                return 'размер шрифта должен быть ' + expected(profile, 'size', '14pt')
             case ErrorType.MARGIN_RIGHT:
-                return 'отступ справа должен быть 15мм'
+                return 'отступ справа должен быть ' + expected(profile, 'margin_right', '15мм')
             case ErrorType.MARGIN_LEFT:
-                return 'отступ слева должен быть 25мм'
+                return 'отступ слева должен быть ' + expected(profile, 'margin_left', '25мм')
             case ErrorType.TEXT_INDENT:
-                return 'абзацный отступ должен быть 125мм'
+                return 'абзацный отступ должен быть ' + expected(profile, 'text_indent', '12.5мм')
             case ErrorType.ALIGNMENT:
-                return 'выравнивание должно быть ширине'
+                return 'выравнивание должно быть ' + expected(profile, 'text_align', 'по ширине')
             case ErrorType.HEADER_DOT:
                 return 'точка после номера и в конце названия раздела не ставится'
             case ErrorType.HEADER_NEWLINE:
@@ -131,142 +144,692 @@ class ErrorType(Enum):
             case ErrorType.NAME_OF_IMAGE:
                 return 'не найдено или неправильно оформлено имя рисунка. Рисунки нумеруются \
 арабскими цифрами по схеме «рисунок номер_раздела.номер_рисунка - описание»'
+            case ErrorType.IMAGE_RESOLUTION:
+                return f'разрешение рисунка должно быть не меньше {MIN_DPI} точек на дюйм'
+            case ErrorType.IMAGE_WIDTH:
+                return 'рисунок не должен выходить за поля страницы'
             case ErrorType.COLOR:
-                return 'цвет текста должен быть черным'
+                return 'цвет текста должен быть ' + expected(profile, 'color', 'черным')
             case ErrorType.LOWER_OFFSET:
-                return 'нижнее поле страницы должно быть 20мм'
+                return 'нижнее поле страницы должно быть ' + expected(profile, 'padding_bottom', '20мм')
             case ErrorType.UPPER_OFFSET:
-                return 'верхнее поле страницы должно быть 20мм'
+                return 'верхнее поле страницы должно быть ' + expected(profile, 'padding_top', '20мм')
             case ErrorType.NO_TABLE_OF_CONTENTS:
                 return 'в файле должно быть авто оглавление'
             case _:
                 return 'неизвестная ошибка'
 
 
-@dataclass
-class Error:
+ALIGNMENTS = {
+    "justify": "по ширине",
+    "center": "по центру",
+    "start": "по левому краю",
+    "left": "по левому краю",
+    "end": "по правому краю",
+    "right": "по правому краю",
+}
+
+# Ожидаемое значение поля профиля в тексте ошибки. Значения ГОСТ 2.105 записаны в стилях ODF
+# относительно полей страницы, поэтому для них, как и раньше, - формулировка из ГОСТ (gost);
+# значение, которое профиль поменял, выводится как в профиле.
+def expected(profile: "StyleProfile | None", field: str, gost: str) -> str:
+    value = getattr(profile or GOST_2_105, field)
+    if value == getattr(GOST_2_105, field):
+        return gost
+    if field == "text_align":
+        return ALIGNMENTS.get(value, value)
+    return value
+
+
+# Порядок, в котором ошибки одного элемента выводятся в pretty()
+ERROR_ORDER = (
+    ErrorType.FONT,
+    ErrorType.FONT_SIZE,
+    ErrorType.MARGIN_RIGHT,
+    ErrorType.MARGIN_LEFT,
+    ErrorType.TEXT_INDENT,
+    ErrorType.ALIGNMENT,
+    ErrorType.LOWER_OFFSET,
+    ErrorType.UPPER_OFFSET,
+    ErrorType.COLOR,
+    ErrorType.SPACING,
+    ErrorType.INVALID_STYLE,
+    ErrorType.HEADER_NEWLINE,
+    ErrorType.HEADER_DOT,
+    ErrorType.SPACE_ABOVE_IMAGE,
+    ErrorType.SPACE_UNDER_IMAGE,
+    ErrorType.NAME_OF_IMAGE,
+    ErrorType.IMAGE_RESOLUTION,
+    ErrorType.IMAGE_WIDTH,
+    ErrorType.FIRST_CHAR_IN_CHAR_LIST,
+    ErrorType.FIRST_CHAR_IN_NUM_LIST,
+    ErrorType.LAST_CHAR_IN_CHAR_LIST,
+    ErrorType.LAST_CHAR_IN_NUM_LIST,
+    ErrorType.ABSENCE_OF_FOOTER,
+    ErrorType.DONT_FOOTER_ON_FIRST_PAGE,
+    ErrorType.NO_TABLE_OF_CONTENTS,
+)
+
+# Ошибки элемента - битовая маска, по биту на ErrorType в порядке ERROR_ORDER. Маска с одним
+# и тем же значением - один и тот же объект, поэтому элементы с одинаковым плохим стилем её делят.
+ErrorSet = IntFlag("ErrorSet", [(kind.name, 1 << bit) for bit, kind in enumerate(ERROR_ORDER)], module=__name__)
+# операции над IntFlag идут через Python-код enum, поэтому маски собираются из int
+ERROR_BITS = {kind: ErrorSet[kind.name]._value_ for kind in ErrorType}
+ERROR_SETS = {}
+ERROR_KINDS = {}
+
+def error_mask(value: int) -> ErrorSet:
+    mask = ERROR_SETS.get(value)
+    if mask is None:
+        mask = ERROR_SETS[value] = ErrorSet(value)
+    return mask
+
+def error_set(kinds) -> ErrorSet:
+    value = 0
+    for kind in kinds:
+        value |= ERROR_BITS[kind]
+    return error_mask(value)
+
+# поле StyleInfo -> ошибка, если оно не такое, как в профиле
+PROFILE_FIELDS = {
+    "font": ErrorType.FONT,
+    "size": ErrorType.FONT_SIZE,
+    "margin_right": ErrorType.MARGIN_RIGHT,
+    "margin_left": ErrorType.MARGIN_LEFT,
+    "text_indent": ErrorType.TEXT_INDENT,
+    "text_align": ErrorType.ALIGNMENT,
+    "padding_bottom": ErrorType.LOWER_OFFSET,
+    "padding_top": ErrorType.UPPER_OFFSET,
+    "color": ErrorType.COLOR,
+}
+LENGTH_FIELDS = ("size", "margin_right", "margin_left", "text_indent", "padding_bottom", "padding_top")
+
+def normalize_value(field: str, value: str) -> str:
+    match field:
+        case "font":
+            return value.strip().strip("'\"")
+        case "color":
+            return value.strip().lower()
+    return value.strip()
+
+# сколько длин и стилей CompiledProfile помнит; процессы сервера и пула живут долго и видят
+# стили многих документов, так что заполненная память начинается заново
+MEMO_SIZE = 4096
+
+# Профиль, готовый к сравнению: ожидаемые длины уже переведены в мм. Разобранные длины из стилей
+# и маски ошибок итоговых стилей копятся здесь и служат всем документам процесса (пакетная
+# проверка, сервер), так что стиль с уже виденными значениями - это поиск в словаре.
+class CompiledProfile:
+    def __init__(self, profile: StyleProfile):
+        self.profile = profile
+        self.lengths = []
+        self.strings = []
+        for field, kind in PROFILE_FIELDS.items():
+            expected = getattr(profile, field)
+            if field in LENGTH_FIELDS:
+                tolerance = profile.size_tolerance * units.MM["pt"] if field == "size" else profile.tolerance
+                self.lengths.append((field, ERROR_BITS[kind], units.to_mm(expected), tolerance))
+            else:
+                self.strings.append((field, ERROR_BITS[kind], normalize_value(field, expected)))
+        self.parsed = {}
+        self.errors = {}
+
+    def length(self, value: str) -> float | None:
+        try:
+            return self.parsed[value]
+        except KeyError:
+            if len(self.parsed) >= MEMO_SIZE:
+                self.parsed.clear()
+            length = self.parsed[value] = units.to_mm(value)
+            return length
+
+    def collect_errors(self, style: StyleInfo) -> ErrorSet:
+        mask = self.errors.get(style)
+        if mask is not None:
+            return mask
+        value = 0
+        for field, bit, expected, tolerance in self.lengths:
+            length = self.length(getattr(style, field))
+            # у стиля нет значения или оно в процентах
+            if length is None or expected is None or abs(length - expected) > tolerance:
+                value |= bit
+        for field, bit, expected in self.strings:
+            if normalize_value(field, getattr(style, field)) != expected:
+                value |= bit
+        if len(self.errors) >= MEMO_SIZE:
+            self.errors.clear()
+        mask = self.errors[style] = error_mask(value)
+        return mask
 
+# один CompiledProfile на профиль в процессе, для нескольких последних профилей
+@functools.lru_cache(maxsize=16)
+def compile_profile(profile: StyleProfile) -> CompiledProfile:
+    return CompiledProfile(profile)
+
+# ErrorType маски в порядке вывода; кортеж для каждого значения строится один раз
+def error_kinds(mask: ErrorSet) -> tuple[ErrorType, ...]:
+    kinds = ERROR_KINDS.get(mask)
+    if kinds is None:
+        kinds = tuple(kind for bit, kind in enumerate(ERROR_ORDER) if mask >> bit & 1)
+        ERROR_KINDS[mask] = kinds
+    return kinds
+
+
+# text - та же строка, что и текст элемента в Node, а не копия.
+# errors можно передать списком ErrorType или маской ErrorSet, хранится маска.
+# style - стиль элемента, position - его номер среди элементов тела (в порядке документа, с 1),
+# xpath - путь к нему в content.xml; у глобальных ошибок все три None.
+class Error:
+    __slots__ = ("text", "mask", "style", "position", "xpath")
     text: str
-    errors: list[ErrorType]
+    mask: ErrorSet
+    style: str | None
+    position: int | None
+    xpath: str | None
 
-    def pretty(self) -> str:
+    def __init__(self, text: str, errors, style: str | None = None, position: int | None = None,
+                 xpath: str | None = None):
+        self.text = text
+        self.mask = errors if isinstance(errors, ErrorSet) else error_set(errors)
+        self.style = style
+        self.position = position
+        self.xpath = xpath
+
+    @property
+    def errors(self) -> tuple[ErrorType, ...]:
+        return error_kinds(self.mask)
+
+    # та же ошибка у элемента, который переехал на другое место
+    def moved(self, position: int | None, xpath: str | None) -> "Error":
+        if position == self.position and xpath == self.xpath:
+            return self
+        return Error(self.text, self.mask, self.style, position, xpath)
+
+    def __eq__(self, other):
+        if not isinstance(other, Error):
+            return NotImplemented
+        return self.text == other.text and self.mask == other.mask
+
+    def __repr__(self) -> str:
+        return f"Error(text={self.text!r}, errors={list(self.errors)!r})"
+
+    def pretty(self, profile: StyleProfile | None = None) -> str:
         output = self.text +'\n'
         output += '^' * min(87, len(self.text)) + '\n'
         output += 'Ошибки:\n'
         for error in self.errors:
-            output += f"- {error.pretty()}\n"
+            output += f"- {error.pretty(profile)}\n"
         return output
 
 
-class Elem_xml_tree(ET.Element, NodeMixin):
-    def __init__(self, xml_elem: ET.Element, parent=None, children=None):
-        super(Elem_xml_tree).__init__()
-        _, _, tail = xml_elem.tag.partition('}')
-        self.tag = tail
-        self.xml_elem = xml_elem
-        self.parent = parent
-        if children:
-            self.children = children
+# (элемент свойств, атрибут) -> поле StyleInfo
+STYLE_PROPERTIES = {
+    ("text-properties", "font-name"): "font",
+    ("text-properties", "font-size"): "size",
+    ("text-properties", "color"): "color",
+    ("paragraph-properties", "margin-right"): "margin_right",
+    ("paragraph-properties", "margin-left"): "margin_left",
+    ("paragraph-properties", "text-indent"): "text_indent",
+    ("paragraph-properties", "text-align"): "text_align",
+    ("paragraph-properties", "padding-bottom"): "padding_bottom",
+    ("paragraph-properties", "padding-top"): "padding_top",
+}
 
-def load_children(parent: Elem_xml_tree, elem_xml: ET.Element):
-    for elem in list(elem_xml):
-        children = Elem_xml_tree(elem, parent=parent)
-        load_children(children, elem)
+def style_properties(elem: ET.Element) -> dict[str, str]:
+    properties = {}
+    for child in elem:
+        kind = local_name(child.tag)
+        for (tag, item) in child.attrib.items():
+            field = STYLE_PROPERTIES.get((kind, local_name(tag)))
+            if field is not None:
+                properties[field] = sys.intern(item)
+    return properties
 
-def internal_text(root: Elem_xml_tree):
-    return "".join(root.xml_elem.itertext())
+def style_attributes(elem: ET.Element) -> dict[str, str]:
+    return {local_name(tag): item for (tag, item) in elem.attrib.items()}
 
 
-class StyleChecker:
+# Итоговые стили с учётом наследования (parent-style-name) и стилей по умолчанию из styles.xml.
+# Каждый стиль вычисляется один раз, даже если у многих стилей общие предки;
+# одинаковые итоговые стили делят одну маску ошибок.
+class StyleResolver:
+    def __init__(self, profile: CompiledProfile | None = None):
+        self.profile = profile or compile_profile(GOST_2_105)
+        self.defaults = {}
+        self.declared = {}
+        self.resolved = {}
+        self.bases = {}
 
-    file_name: str
-    styleErorrs: dict[list[ErrorType]]
-    listStyle: dict[list[str]]
-    tree: list[ET.Element]
-    all_errors: list[str]
-    data: list[str]
-    footer: bool
-    footer_on_first_page: bool
-    table_of_contents: bool
+    def add_default(self, elem: ET.Element):
+        family = style_attributes(elem).get("family", "")
+        self.defaults[family] = style_properties(elem)
 
-    def __init__(self, name):
-        self.file_name = name
-        self.styleErrors = {}
-        self.listStyle = {}
-        self.tree = []
-        self.all_errors = []
-        self.data = []
-        self.footer = False
-        self.footer_on_first_page = False
-        self.table_of_contents = False
+    def add(self, elem: ET.Element):
+        attributes = style_attributes(elem)
+        key = (attributes.get("family", ""), attributes.get("name", ""))
+        self.declared[key] = (attributes.get("parent-style-name"), style_properties(elem))
 
-    def run(self) -> list[Error]:
-        with tempfile.TemporaryDirectory() as work_dir:
-            with zipfile.ZipFile(self.file_name) as source_file:
-                source_file.extractall(work_dir)
-            file = ET.parse(work_dir + "/content.xml")
-            root_tree = Elem_xml_tree(file.getroot())
-            load_children(root_tree, file.getroot())
+    def __base(self, family: str) -> StyleInfo:
+        if family not in self.bases:
+            self.bases[family] = replace(default_style, **self.defaults.get(family, {}))
+        return self.bases[family]
 
-        for chapter in root_tree.children:
-            match chapter.tag:
-                case "font-face-decls":
-                    pass 
-                case "automatic-styles":
-                    for i in range(len(chapter.children)):
-                        match chapter.children[i].tag:
-                            case "style":
-                                self.__is_valid_style(chapter.children[i])
-                            case "list-style":
-                                self.__add_list_style(chapter.children[i])
-                case "body":
-                    for body_chapter in chapter.children:
-                        if body_chapter.tag == "text":
-                            self.__check_text(body_chapter)
+    def resolve(self, family: str, name: str, seen: frozenset = frozenset()) -> StyleInfo | None:
+        key = (family, name)
+        if key in self.resolved:
+            return self.resolved[key]
+        if key not in self.declared or key in seen:
+            return None
+        parent, properties = self.declared[key]
+        style = self.apply(family, parent, properties, seen | {key})
+        self.resolved[key] = style
+        return style
+
+    def apply(self, family: str, parent: str | None, properties: dict[str, str], seen: frozenset = frozenset()) -> StyleInfo:
+        base = None
+        if parent is not None:
+            base = self.resolve(family, parent, seen)
+        if base is None:
+            base = self.__base(family)
+        if len(properties) == 0:
+            return base
+        return replace(base, **properties)
+
+    def inherits(self, family: str, parent: str | None, ancestor: str) -> bool:
+        seen = set()
+        while parent is not None and parent not in seen:
+            if parent == ancestor:
+                return True
+            seen.add(parent)
+            declared = self.declared.get((family, parent))
+            parent = declared[0] if declared is not None else None
+        return False
+
+    def collect_errors(self, style: StyleInfo) -> ErrorSet:
+        return self.profile.collect_errors(style)
+
+
+def local_name(tag: str) -> str:
+    _, _, tail = tag.partition('}')
+    return tail
+
+# префиксы пространств имён ODF для XPath элементов в отчётах
+NAMESPACES = {
+    "urn:oasis:names:tc:opendocument:xmlns:office:1.0": "office",
+    "urn:oasis:names:tc:opendocument:xmlns:style:1.0": "style",
+    "urn:oasis:names:tc:opendocument:xmlns:text:1.0": "text",
+    "urn:oasis:names:tc:opendocument:xmlns:table:1.0": "table",
+    "urn:oasis:names:tc:opendocument:xmlns:drawing:1.0": "draw",
+    "urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0": "fo",
+    "urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0": "svg",
+    "urn:oasis:names:tc:opendocument:xmlns:meta:1.0": "meta",
+    "http://www.w3.org/1999/xlink": "xlink",
+    "urn:org:documentfoundation:names:experimental:office:xmlns:loext:1.0": "loext",
+}
+
+def qualified_name(tag: str) -> str:
+    uri, _, name = tag[1:].partition('}')
+    if not name:
+        return tag
+    prefix = NAMESPACES.get(uri)
+    return name if prefix is None else f"{prefix}:{name}"
+
+# location - (XPath родителя, полный тег, номер среди соседей с тем же тегом)
+def location_xpath(location: tuple[str, str, int]) -> str:
+    parent, tag, index = location
+    return f"{parent}/{qualified_name(tag)}[{index}]"
+
+def style_name(node: "Node") -> str | None:
+    for (tag, item) in node.attrib.items():
+        if local_name(tag) == "style-name":
+            return item
+    return None
+
+
+# рисунок в draw:frame: путь в архиве (name) или начало встроенного в плоский документ файла (data)
+# и размер рамки в мм
+@dataclass(frozen=True, slots=True)
+class Picture:
+    name: str | None
+    data: bytes | None
+    width: float | None
+    height: float | None
+
+
+# то, что правилам нужно знать об элементе тела документа
+@dataclass(slots=True)
+class Node:
+    tag: str
+    attrib: dict[str, str]
+    text: str
+    annotated: bool
+    image: bool
+    pictures: tuple[Picture, ...] = ()
+    # отпечаток для Incremental, считается при первом обращении
+    key: tuple | None = None
+
+# один проход по поддереву: текст, флаги аннотации и картинки, рисунки
+def subtree_facts(tag: str, xml_elem: ET.Element) -> Node:
+    annotated = False
+    image = False
+    embedded = False
+    pictures = ()
+    for child in xml_elem.iter():
+        child_tag = local_name(child.tag)
+        if child_tag == "annotation" or child_tag == "annotation-end":
+            annotated = True
+        elif child_tag == "image":
+            image = True
+        elif child_tag == "frame":
+            picture = frame_picture(child)
+            if picture is not None:
+                pictures += (picture,)
+        elif child_tag == "binary-data":
+            embedded = True
+    text = "".join(xml_elem.itertext()) if not embedded else "".join(visible_text(xml_elem))
+    return Node(tag, xml_elem.attrib, text, annotated, image, pictures)
+
+# текст без рисунков, встроенных в плоский документ (base64 в office:binary-data): у .odt их там нет
+def visible_text(xml_elem: ET.Element):
+    if local_name(xml_elem.tag) == "binary-data":
+        return
+    if xml_elem.text:
+        yield xml_elem.text
+    for child in xml_elem:
+        yield from visible_text(child)
+        if child.tail:
+            yield child.tail
+
+# первый draw:image рамки: следующие - замены для программ, которые не умеют первый формат
+def frame_picture(frame: ET.Element) -> Picture | None:
+    for child in frame:
+        if local_name(child.tag) != "image":
+            continue
+        name = None
+        data = None
+        for (tag, item) in child.attrib.items():
+            if local_name(tag) == "href":
+                name = item.removeprefix("./")
+        if name is None:
+            for inner in child:
+                if local_name(inner.tag) == "binary-data":
+                    import images
+                    data = images.embedded(inner.text or "")
+        size = {local_name(tag): item for (tag, item) in frame.attrib.items()}
+        return Picture(name, data, units.to_mm(size.get("width")), units.to_mm(size.get("height")))
+    return None
+
+# считается один раз на элемент: соседи картинки и пункты списка берут готовое
+def node_facts(elem: "tree.Elem_xml_tree") -> Node:
+    if elem.facts is None:
+        elem.facts = subtree_facts(elem.tag, elem.xml_elem)
+    return elem.facts
+
+
+# абзацы и заголовки проверяются целиком, внутрь них обход не заходит
+INLINE_TAGS = ("p", "h")
+
+
+# элемент тела, который потоковый движок ещё не проверил: ждёт соседей снизу
+@dataclass(slots=True)
+class Slot:
+    node: Node
+    items: list[str]
+    inner: list[Error]
+    position: int
+    location: tuple[str, str, int]
+
+
+# открытый элемент-контейнер (всё, кроме абзацев и заголовков) в потоковом движке
+class Frame:
+    def __init__(self, elem: ET.Element, tag: str, top: bool, position: int, location: tuple[str, str, int] | None):
+        self.elem = elem
+        self.tag = tag
+        self.top = top
+        self.position = position
+        self.location = location
+        self.xpath = location_xpath(location) if location is not None else ""
+        # сколько детей с каждым тегом уже встретилось - для их номеров в XPath
+        self.counts = {}
+        self.parts = []
+        self.pending = None
+        self.annotated = tag == "annotation" or tag == "annotation-end"
+        self.image = tag == "image"
+        self.items = []
+        self.window = deque()
+        self.prev = None
+        self.errors = []
+
+    def close(self) -> Node:
+        if self.pending is not None:
+            elem, node = self.pending
+            self.parts.append(node.text)
+            self.parts.append(elem.tail or "")
+        text = (self.elem.text or "") + "".join(self.parts)
+        del self.elem[:]
+        return Node(self.tag, self.elem.attrib, text, self.annotated, self.image)
+
+
+class Cancelled(Exception):
+    pass
+
+
+@dataclass
+class Counter:
+    seconds: float = 0.0
+    calls: int = 0
+    elements: int = 0
+
+
+# Замеры одной проверки: время, число вызовов и пройденных элементов по этапам и правилам.
+# Этапы замеряются всегда (это несколько вызовов perf_counter на документ),
+# правила - только при StyleChecker(..., profile=True). Время правила включает вложенные
+# в него замеры (style_errors вызывается из правила style).
+class Stats:
+    phases: dict[str, Counter]
+    rules: dict[str, Counter]
+
+    def __init__(self):
+        self.phases = {}
+        self.rules = {}
+
+    def phase(self, name: str) -> Counter:
+        if name not in self.phases:
+            self.phases[name] = Counter()
+        return self.phases[name]
+
+    def rule(self, name: str) -> Counter:
+        if name not in self.rules:
+            self.rules[name] = Counter()
+        return self.rules[name]
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": {name: vars(counter) for name, counter in self.phases.items()},
+            "rules": {name: vars(counter) for name, counter in self.rules.items()},
+        }
+
+    def pretty(self) -> str:
+        output = f"{'Этап':<24}{'время, с':>12}{'вызовов':>10}{'элементов':>12}\n"
+        for name, counter in self.phases.items():
+            output += f"{name:<24}{counter.seconds:>12.4f}{counter.calls:>10}{counter.elements:>12}\n"
+        if len(self.rules) != 0:
+            output += f"{'Правило':<24}{'время, с':>12}{'вызовов':>10}{'элементов':>12}\n"
+            for name, counter in sorted(self.rules.items(), key=lambda item: -item[1].seconds):
+                output += f"{name:<24}{counter.seconds:>12.4f}{counter.calls:>10}{counter.elements:>12}\n"
+        return output
+
+
+# Элемент тела документа в том виде, в каком его получают правила
+@dataclass(slots=True)
+class BodyElement:
+    node: Node
+    top_level: bool
+    prev: Node | None
+    following: list[Node]
+    items: list[str]
+
+
+NEIGHBOURS = "neighbours"
+ITEMS = "items"
+PICTURES = "pictures"
+
+
+# Правило проверки. tags - теги элементов тела, которые правило проверяет, facts - что ему нужно
+# кроме самого элемента: NEIGHBOURS (предыдущий и два следующих соседа), ITEMS (тексты пунктов
+# списка) и PICTURES (заголовки файлов рисунков, см. StyleChecker.picture_info). check возвращает
+# ErrorType или ErrorSet, которые вместе с ошибками других правил для этого элемента собираются
+# в одну Error с его текстом, или готовые Error. finish вызывается после обхода тела и возвращает
+# глобальные ошибки документа. kinds - ErrorType, которые правило может найти.
+# pure = False у правил, которые что-то запоминают в checker: их нельзя пропускать при повторной
+# проверке (см. Incremental).
+class Rule:
+    name = ""
+    tags = ()
+    facts = frozenset()
+    kinds = ()
+    pure = True
+
+    def check(self, checker: "StyleChecker", element: BodyElement) -> list:
+        return []
+
+    def finish(self, checker: "StyleChecker") -> list[ErrorType]:
+        return []
+
+
+class StyleRule(Rule):
+    name = "style"
+    tags = ("p", "h")
+    kinds = ERROR_ORDER[:ERROR_ORDER.index(ErrorType.INVALID_STYLE) + 1]
+
+    def check(self, checker, element):
+        node = element.node
+        if node.text == "" or node.annotated:
+            return []
         errors = []
-        if not self.footer:
-            errors.append(ErrorType.ABSENCE_OF_FOOTER)
-        if not (self.footer or self.footer_on_first_page):
-            errors.append(ErrorType.DONT_FOOTER_ON_FIRST_PAGE)
-        if not self.table_of_contents:
-            errors.append(ErrorType.NO_TABLE_OF_CONTENTS)
-        if len(errors) != 0:
-            self.all_errors.append(Error("<глобальные ошибки>", errors))
-        return self.all_errors
+        for (tag, item) in node.attrib.items():
+            if local_name(tag) == "style-name":
+                errors.append(checker.style_errors(item))
+        return errors
+
+
+class ImageRule(Rule):
+    name = "image"
+    tags = ("p",)
+    facts = frozenset([NEIGHBOURS])
+    kinds = (ErrorType.SPACE_ABOVE_IMAGE, ErrorType.SPACE_UNDER_IMAGE, ErrorType.NAME_OF_IMAGE)
+
+    def check(self, checker, element):
+        node = element.node
+        ## проверка не находится ли картинка в таблицах и т.п.
+        if not element.top_level or node.annotated or not node.image:
+            return []
+
+        text = "неизвестный рисунок"
+        errors = []
+        if element.prev is None or element.prev.text != "":
+            errors.append(ErrorType.SPACE_ABOVE_IMAGE)
+        if len(element.following) != 0 and element.following[0].text != "":
+            errors.append(ErrorType.SPACE_UNDER_IMAGE)
 
-    def __check_text(self, root: Elem_xml_tree):
-        for i in range(len(root.children)):
+        for sibling in element.following:
+            name = sibling.text
+            if sibling.tag == "p" and name != "":
+                if sibling.annotated:
+                    return []
+                match name.split():
+                    case ["рисунок", _, "-", *_]:
+                        text = name
+                    case _:
+                        errors.append(ErrorType.NAME_OF_IMAGE)
+                if len(errors) != 0:
+                    return [Error(text, errors)]
+                else:
+                    return []
+        errors.append(ErrorType.NAME_OF_IMAGE)
+        return [Error(text, errors)]
+
+
+# разрешение растрового рисунка в рамке (пиксели на её размер), не меньше
+MIN_DPI = 150
+# насколько рамка может быть шире области текста, мм
+WIDTH_TOLERANCE = 0.5
+
+
+# точек на дюйм у рисунка в рамке; без размера рамки - записанное в файле; у SVG - None
+def effective_dpi(info: "images.ImageInfo", picture: Picture) -> float | None:
+    if info.width is None:
+        return None
+    if picture.width and picture.height:
+        return min(info.width / picture.width, info.height / picture.height) * 25.4
+    if info.dpi is not None:
+        return min(info.dpi)
+    return None
+
+
+# рисунки по заголовкам их файлов: разрешение и ширина рамки относительно области текста страницы
+class FigureRule(Rule):
+    name = "figure"
+    tags = ("p",)
+    facts = frozenset([PICTURES])
+    kinds = (ErrorType.IMAGE_RESOLUTION, ErrorType.IMAGE_WIDTH)
+
+    def check(self, checker, element):
+        node = element.node
+        if node.annotated or len(node.pictures) == 0:
+            return []
+        found = []
+        for picture in node.pictures:
             errors = []
-            match root.children[i].tag:
-                case "table":
-                    pass
-                case "p":
-                    errors += self.__check_simple_text(root.children[i])
-                    errors += self.__check_image(root, i)
-                case "h":
-                    errors += self.__check_header(root.children[i], root.children[i + 1] \
-                                      if i + 1 != len(root.children) else None)
-                case "table-of-content":
-                    self.table_of_contents = True
-                case "list":
-                    errors += self.__check_list(root.children[i])
-                
-            for error in errors:
-                self.all_errors.append(error)
+            info = checker.picture_info(picture)
+            if info is not None:
+                dpi = effective_dpi(info, picture)
+                if dpi is not None and dpi < MIN_DPI:
+                    errors.append(ErrorType.IMAGE_RESOLUTION)
+            if checker.text_width is not None and picture.width is not None \
+                    and picture.width > checker.text_width + WIDTH_TOLERANCE:
+                errors.append(ErrorType.IMAGE_WIDTH)
+            if len(errors) != 0:
+                text = node.text if node.text != "" else f"рисунок {picture.name or '(встроенный)'}"
+                found.append(Error(text, errors))
+        return found
 
-            if root.children[i].tag != "p" and root.children[i].tag != "h":
-                self.__check_text(root.children[i])
-            
-    def __check_list(self, node: Elem_xml_tree):
+
+class HeaderRule(Rule):
+    name = "header"
+    tags = ("h",)
+    facts = frozenset([NEIGHBOURS])
+    kinds = (ErrorType.HEADER_NEWLINE, ErrorType.HEADER_DOT)
+
+    def check(self, checker, element):
+        text = element.node.text
+        if text == "" or element.node.annotated:
+            return []
         errors = []
-        for (tag, item) in node.xml_elem.attrib.items():
-            _, _, tail_tag = tag.partition('}')
-            if tail_tag == "style-name":
-                bullet = self.listStyle[item]
-            text = []
-            for child in node.children:
-                if child.tag == "list-item":
-                    text.append(internal_text(child))
+        num = ""
+        for i in text:
+            if i.isnumeric():
+                num += i
+        if text == "" or len(element.following) == 0 or text[len(num)] == '.':
+            errors.append(ErrorType.HEADER_NEWLINE)
+        if text[-1] == '.':
+            errors.append(ErrorType.HEADER_DOT)
+        return errors
+
+
+class ListRule(Rule):
+    name = "list"
+    tags = ("list",)
+    facts = frozenset([ITEMS])
+    kinds = (ErrorType.FIRST_CHAR_IN_CHAR_LIST, ErrorType.FIRST_CHAR_IN_NUM_LIST,
+             ErrorType.LAST_CHAR_IN_CHAR_LIST, ErrorType.LAST_CHAR_IN_NUM_LIST)
+
+    def check(self, checker, element):
+        text = element.items
+        errors = []
+        for (tag, item) in element.node.attrib.items():
+            if local_name(tag) == "style-name":
+                bullet = checker.listStyle[item]
             for i in range(len(text)):
                 if bullet == "char": 
                     if i == 0:
@@ -299,155 +862,702 @@ class StyleChecker:
                     meow = "\n".join(text)
                     return [Error(meow, errors)]
         return []
-            
-    def __check_image(self, node: Elem_xml_tree, num):
-        for _, _, elem in RenderTree(node.children[num]):
-            if elem.tag == "annotation" or elem.tag == "annotation-end":
-                return []  
-        for _, _, elem in RenderTree(node.children[num]):
-            if elem.tag == "image":
-
-                meow = node
-                while meow.parent.tag != "body":
-                    meow = meow.parent
-                if meow != node:
-                    return []
-                ## проверка не находится ли картинка в таблицах и т.п.
-
-                text = "неизвестный рисунок"
-                errors = []
-                if num == 0 or internal_text(node.children[num - 1]) != "":
-                    errors.append(ErrorType.SPACE_ABOVE_IMAGE)
-                if num - 1 == len(node.children) or \
-                    num + 1 < len(node.children) and internal_text(node.children[num + 1]) != "":
-                    errors.append(ErrorType.SPACE_UNDER_IMAGE)
-                
-                i = num + 1
-                while i < len(node.children) and i < num + 3:
-                    name = internal_text(node.children[i])
-                    if node.children[i].tag == "p" and name != "":
-                        for _, _, meow in RenderTree(node.children[i]):
-                            if meow.tag == "annotation" or meow.tag == "annotation-end":
-                                return []
-                        match name.split():
-                            case ["рисунок", _, "-", *_]:
-                                text = name
-                            case _:
-                                errors.append(ErrorType.NAME_OF_IMAGE)
-                        if len(errors) != 0:
-                            return [Error(text, errors)]
-                        else:
-                            return []
-                    i += 1
-                errors.append(ErrorType.NAME_OF_IMAGE)
-                return [Error(text, errors)]
+
+
+# флаги footer и footer_on_first_page выставляются при разборе стилей
+class FooterRule(Rule):
+    name = "footer"
+    kinds = (ErrorType.ABSENCE_OF_FOOTER, ErrorType.DONT_FOOTER_ON_FIRST_PAGE)
+
+    def finish(self, checker):
+        errors = []
+        if not checker.footer:
+            errors.append(ErrorType.ABSENCE_OF_FOOTER)
+        if not (checker.footer or checker.footer_on_first_page):
+            errors.append(ErrorType.DONT_FOOTER_ON_FIRST_PAGE)
+        return errors
+
+
+class TableOfContentsRule(Rule):
+    name = "table-of-contents"
+    tags = ("table-of-content",)
+    kinds = (ErrorType.NO_TABLE_OF_CONTENTS,)
+    pure = False
+
+    def check(self, checker, element):
+        checker.table_of_contents = True
+        return []
+
+    def finish(self, checker):
+        if not checker.table_of_contents:
+            return [ErrorType.NO_TABLE_OF_CONTENTS]
         return []
-    
-    def __add_list_style(self, elem: Elem_xml_tree):
-        if elem.tag == "list-style":
-            bullet = ""
-            name_style = ""
-            for (tag, item) in elem.xml_elem.attrib.items():
-                _, _, tail_tag = tag.partition('}')
-                if tail_tag == "name":
-                    name_style = item
-            for child in elem.children:
-                if child.tag == "list-level-style-bullet":
-                    bullet = "char"
+
+
+DEFAULT_RULES = (StyleRule(), ImageRule(), FigureRule(), HeaderRule(), ListRule(), FooterRule(),
+                 TableOfContentsRule())
+
+
+# Таблица тег -> проверки, строится один раз на проверку документа.
+# wrap(rule) может подменить rule.check, например обёрткой с замерами.
+class RuleSet:
+    def __init__(self, rules, wrap=None):
+        self.rules = list(rules)
+        self.dispatch = {}
+        self.neighbours = set()
+        self.items = set()
+        self.impure = set()
+        self.pictures = any(PICTURES in rule.facts for rule in self.rules)
+        for rule in self.rules:
+            check = rule.check if wrap is None else wrap(rule)
+            for tag in rule.tags:
+                self.dispatch.setdefault(tag, []).append(check)
+                if not rule.pure:
+                    self.impure.add(tag)
+                if NEIGHBOURS in rule.facts:
+                    self.neighbours.add(tag)
+                if ITEMS in rule.facts:
+                    self.items.add(tag)
+
+    def names(self) -> list[str]:
+        return [rule.name for rule in self.rules]
+
+
+def visited_elements(checker, element: BodyElement) -> int:
+    return 1 + (element.prev is not None) + len(element.following) + len(element.items)
+
+
+def digest(data: bytes | None) -> bytes:
+    return b"" if data is None else hashlib.sha256(data).digest()
+
+
+def fingerprint(node: Node) -> tuple:
+    if node.key is None:
+        node.key = (node.tag, tuple(node.attrib.items()), node.text, node.annotated, node.image, node.pictures)
+    return node.key
+
+
+# Что проверка запоминает между запусками на одном и том же документе (режим слежения):
+# хеши content.xml и styles.xml с ошибками прошлого запуска, разобранные стили и ошибки
+# элементов тела по отпечатку всего, что видят правила (сам элемент, соседи, пункты списка).
+# Если файл не изменился, ошибки отдаются как есть; стили разбираются заново, только если
+# изменились styles.xml или automatic-styles; элемент проверяется заново, только если изменился
+# его отпечаток или стили. Один объект - на один документ и один набор правил.
+class Incremental:
+    members: tuple[bytes, bytes] | None
+    errors: list[Error] | None
+    common: tuple | None
+    automatic: tuple | None
+    styles_key: bytes | None
+    elements: dict[int, tuple[tuple, list[Error]]]
+    reused: int
+    checked: int
+
+    def __init__(self):
+        self.members = None
+        self.errors = None
+        self.common = None
+        self.automatic = None
+        self.styles_key = None
+        self.elements = {}
+        self.reused = 0
+        self.checked = 0
+
+
+class StyleChecker:
+
+    source: object
+    streaming: bool
+    cache: object
+    progress: object
+    cancelled: object
+    processed: int
+    profile: bool
+    stats: Stats
+    rules: RuleSet
+    style_profile: StyleProfile
+    incremental: Incremental | None
+    styleErorrs: dict[ErrorSet]
+    listStyle: dict[list[str]]
+    resolver: StyleResolver
+    tree: list[ET.Element]
+    all_errors: list[str]
+    data: list[str]
+    footer: bool
+    footer_on_first_page: bool
+    table_of_contents: bool
+    pageLayouts: dict[str, float | None]
+    text_width: float | None
+    pictures: dict[str, object]
+    document: loader.Document | None
+
+    # progress(n) вызывается по ходу проверки с числом пройденных элементов тела документа,
+    # cancelled() - там же; если он вернул True, проверка прерывается исключением Cancelled.
+    # profile=True включает замеры по правилам в stats.
+    # rules - набор правил (по умолчанию DEFAULT_RULES), disabled - имена правил, которые не запускать.
+    # incremental - состояние прошлой проверки этого документа, обновляется по её окончании
+    # source - путь до .odt или .fodt, их содержимое в bytes или файлоподобный объект (см. loader.Document)
+    # jobs > 1 - тело проверяется по частям в пуле из jobs процессов (см. parallel.py), результат тот же;
+    # с incremental не совмещается
+    # style_profile - требования к оформлению абзацев (по умолчанию GOST_2_105, другие - profiles.py)
+    def __init__(self, source, streaming: bool = False, cache=None, progress=None, cancelled=None,
+                 profile: bool = False, rules=None, disabled=(), incremental: Incremental | None = None,
+                 jobs: int | None = None, style_profile: StyleProfile | None = None):
+        if jobs is not None and jobs > 1 and incremental is not None:
+            raise ValueError("incremental checks cannot be split into parts")
+        self.source = source
+        self.jobs = jobs if jobs is not None and jobs > 1 else None
+        self.incremental = incremental
+        self.streaming = streaming
+        self.cache = cache
+        self.progress = progress
+        self.cancelled = cancelled
+        self.processed = 0
+        self.profile = profile
+        self.stats = Stats()
+        enabled = [rule for rule in (DEFAULT_RULES if rules is None else rules) if rule.name not in disabled]
+        if profile:
+            # правила и разбор стилей подменяются обёртками с замерами, без profile вызываются напрямую
+            self.rules = RuleSet(enabled, lambda rule: self.__timed(rule.name, rule.check, visited_elements))
+            self.style_errors = self.__timed("style_errors", self.style_errors, lambda style_name: 1)
+            self.__is_valid_style = self.__timed("is_valid_style", self.__is_valid_style,
+                                                 lambda elem, register=True: 1)
+        else:
+            self.rules = RuleSet(enabled)
+        self.styleErrors = {}
+        self.listStyle = {}
+        self.style_profile = style_profile or GOST_2_105
+        self.resolver = StyleResolver(compile_profile(self.style_profile))
+        self.tree = []
+        self.all_errors = []
+        self.data = []
+        self.footer = False
+        self.footer_on_first_page = False
+        self.table_of_contents = False
+        # ширина области текста по разметкам страниц (мм) и та, что у основной страницы
+        self.pageLayouts = {}
+        self.text_width = None
+        # заголовки рисунков архива (images.ImageInfo или None) - по одному чтению на рисунок
+        self.pictures = {}
+        self.document = None
+
+    def run(self) -> list[Error]:
+        for _ in self.iter_errors():
+            pass
+        return self.all_errors
+
+    # то же, что run, но отдаёт ошибки по мере их обнаружения.
+    # В stats.phases копится время этапов: open - чтение оглавления архива, unzip (с кэшем или
+    # profile) - распаковка content.xml и styles.xml, styles.xml, parse и tree (только для дерева),
+    # automatic-styles и body - обход тела; если content.xml не распакован заранее, parse включает
+    # распаковку, а у потокового движка body включает и разбор. Время, которое вызывающий тратит
+    # между ошибками, тоже попадает в body.
+    def iter_errors(self):
+        start = time.perf_counter()
+        with loader.Document(self.source) as document:
+            self.document = document
+            self.__phase("open", start)
+            if self.cache is None and not self.profile and self.incremental is None:
+                if document.has(loader.STYLES):
+                    start = time.perf_counter()
+                    with document.open(loader.STYLES) as styles:
+                        self.__load_common_styles(ET.parse(styles).getroot())
+                    self.__phase("styles.xml", start, len(self.resolver.declared))
+                content = document.open(loader.CONTENT)
+            else:
+                start = time.perf_counter()
+                members = {loader.CONTENT: document.read(loader.CONTENT)}
+                if document.has(loader.STYLES):
+                    members[loader.STYLES] = document.read(loader.STYLES)
+                # рисунки в ключе - по оглавлению архива: замена рисунка меняет его CRC
+                if self.rules.pictures:
+                    members[loader.PICTURES] = "".join(f"{name}:{size}:{crc}\n" for name, size, crc
+                                                       in document.members(loader.PICTURES)).encode()
+                self.__phase("unzip", start, len(members))
+                if self.cache is not None:
+                    key = self.cache.key(members, ",".join(self.rules.names()) + ";" + repr(self.style_profile))
+                    cached = self.cache.load(key)
+                    if cached is not None:
+                        for error in cached:
+                            self.all_errors.append(error)
+                            yield error
+                        return
+                if self.incremental is not None:
+                    # изменившиеся рисунки, как и стили, требуют проверить элементы заново
+                    keys = (digest(members.get(loader.CONTENT)),
+                            digest(members.get(loader.STYLES)) + digest(members.get(loader.PICTURES)))
+                    if keys == self.incremental.members and self.incremental.errors is not None:
+                        self.incremental.reused = self.incremental.checked = 0
+                        for error in self.incremental.errors:
+                            self.all_errors.append(error)
+                            yield error
+                        return
+                    self.__styles_key = keys[1]
+                    self.__elements = {}
+                    self.incremental.reused = self.incremental.checked = 0
+                # у плоского документа styles.xml нет, его стили разбираются вместе с телом
+                if loader.STYLES in members:
+                    if self.incremental is not None and self.incremental.common is not None \
+                            and self.incremental.common[0] == self.__styles_key:
+                        self.__restore(self.incremental.common[1])
+                    else:
+                        start = time.perf_counter()
+                        self.__load_common_styles(ET.fromstring(members[loader.STYLES]))
+                        self.__phase("styles.xml", start, len(self.resolver.declared))
+                    if self.incremental is not None:
+                        self.incremental.common = (self.__styles_key, self.__snapshot())
+                content = io.BytesIO(members[loader.CONTENT])
+            with content:
+                if self.jobs is not None:
+                    found = self.__parallel(content)
+                elif self.streaming:
+                    found = self.__stream(content)
                 else:
-                    bullet = "num"
-                break
-            self.listStyle[name_style] = bullet
-
-    def __is_valid_style(self, elem: Elem_xml_tree):
-        if elem.tag == "style":
-            style = default_style
-            name_style = ""
-            footer_flag = False
-            for (tag, item) in elem.xml_elem.attrib.items():
-                _, _, tail_tag = tag.partition('}')
-                if tail_tag == "name":
-                    name_style = item
-                if tail_tag == 'parent-style-name' and item == 'Footer':
-                    footer_flag = True
-                if tail_tag == "master-page-name":
-                    self.footer_on_first_page = True
-            for child in elem.children:
-                if child.tag == "text-properties":
-                    for (tag, item) in child.xml_elem.attrib.items():
-                        _, _, tail_tag = tag.partition('}')
-                        if tail_tag == "font-name":
-                            style.font = item
-                        if tail_tag == "font-size":
-                            style.size = item
-                        if tag.find('}color') != -1:
-                            style.color = item
-                if child.tag == "paragraph-properties":
-                    for(tag, item) in child.xml_elem.attrib.items():
-                        _, _, tail_tag = tag.partition('}')
-                        match tail_tag:
-                            case "margin-right":
-                                style.margin_right = item
-                            case "margin-left":
-                                style.margin_left = item
-                            case "text-indent":
-                                style.text_indent = item   
-                            case "text-align":
-                                style.text_align = item 
-                            case "padding-bottom":
-                                style.padding_bottom = item
-                            case "padding-top":
-                                style.padding_top = item
-
-            if footer_flag and style.text_align == 'center':
-                self.footer = True
+                    start = time.perf_counter()
+                    file = ET.parse(content)
+                    self.__phase("parse", start)
+                    found = self.__walk(file)
+                start = time.perf_counter()
+                for error in found:
+                    self.all_errors.append(error)
+                    yield error
+                self.__phase("body", start, self.processed)
+                body = self.stats.phases["body"]
+                for nested in ("tree", "automatic-styles"):
+                    if nested in self.stats.phases:
+                        body.seconds -= self.stats.phases[nested].seconds
+        self.document = None
+        if self.progress is not None:
+            self.progress(self.processed)
+
+        errors = []
+        for rule in self.rules.rules:
+            errors += rule.finish(self)
+        if len(errors) != 0:
+            error = Error("<глобальные ошибки>", errors)
+            self.all_errors.append(error)
+            yield error
+        if self.cache is not None:
+            self.cache.store(key, self.all_errors)
+        if self.incremental is not None:
+            self.incremental.members = keys
+            self.incremental.errors = list(self.all_errors)
+            self.incremental.styles_key = self.__styles_key
+            self.incremental.elements = self.__elements
+
+    def __walk(self, file: ET.ElementTree):
+        # anytree нужен только этому движку, поэтому и загружается только здесь
+        import tree
+        start = time.perf_counter()
+        root_tree = tree.Elem_xml_tree(file.getroot())
+        tree.load_children(root_tree, file.getroot())
+        self.__phase("tree", start)
+        if self.profile:
+            self.stats.phases["tree"].elements += sum(1 for _ in file.iter())
+
+        for chapter in root_tree.children:
+            match chapter.tag:
+                case "font-face-decls":
+                    pass 
+                case "styles":
+                    self.__load_document_styles(chapter.xml_elem)
+                case "automatic-styles":
+                    self.__load_styles(chapter.xml_elem)
+                case "master-styles":
+                    self.__load_document_masters(chapter.xml_elem)
+                case "body":
+                    for body_chapter in chapter.children:
+                        if body_chapter.tag == "text":
+                            xpath = "/" + "/".join(qualified_name(node.xml_elem.tag) for node in body_chapter.path)
+                            yield from self.__check_text(body_chapter, xpath)
+
+    def __phase(self, name: str, start: float, elements: int = 0):
+        counter = self.stats.phase(name)
+        counter.seconds += time.perf_counter() - start
+        counter.calls += 1
+        counter.elements += elements
+
+    def __timed(self, name: str, rule, visited):
+        counter = self.stats.rule(name)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return rule(*args, **kwargs)
+            finally:
+                counter.seconds += time.perf_counter() - start
+                counter.calls += 1
+                counter.elements += visited(*args, **kwargs)
+        return timed
+
+    def __tick(self):
+        self.processed += 1
+        if self.processed % PROGRESS_STEP == 0:
+            if self.cancelled is not None and self.cancelled():
+                raise Cancelled()
+            if self.progress is not None:
+                self.progress(self.processed)
+
+    # разобранные стили: их можно вернуть в другой StyleChecker, не разбирая документ заново
+    def __snapshot(self) -> tuple:
+        return (self.resolver, dict(self.styleErrors), dict(self.listStyle), self.footer, self.footer_on_first_page,
+                dict(self.pageLayouts), self.text_width)
+
+    def __restore(self, state: tuple):
+        resolver, styleErrors, listStyle, self.footer, self.footer_on_first_page, pageLayouts, self.text_width = state
+        self.resolver = resolver
+        self.styleErrors = dict(styleErrors)
+        self.listStyle = dict(listStyle)
+        self.pageLayouts = dict(pageLayouts)
+
+    def __load_styles(self, elem: ET.Element):
+        if self.incremental is not None:
+            self.__styles_key += digest(ET.tostring(elem))
+            automatic = self.incremental.automatic
+            if automatic is not None and automatic[0] == self.__styles_key:
+                self.__restore(automatic[1])
+                return
+        start = time.perf_counter()
+        for child in elem:
+            match local_name(child.tag):
+                case "style":
+                    self.__is_valid_style(child)
+                case "list-style":
+                    self.__add_list_style(child)
+                case "page-layout":
+                    self.__add_page_layout(child)
+        self.__phase("automatic-styles", start, len(elem))
+        if self.incremental is not None:
+            self.incremental.automatic = (self.__styles_key, self.__snapshot())
+
+    # все проверки одного элемента тела: правила из таблицы по его тегу
+    def __visit(self, node: Node, top_level: bool, prev: Node | None, following: list[Node],
+                items: list[str], position: int, location: tuple[str, str, int]) -> list[Error]:
+        if self.incremental is None or node.tag in self.rules.impure:
+            return self.__check_element(node, top_level, prev, following, items, position, location)
+        key = (fingerprint(node), top_level, prev and fingerprint(prev),
+               tuple(fingerprint(sibling) for sibling in following), tuple(items))
+        # словарь по хешу ключа: вложенные кортежи хешируются один раз, а не при каждом обращении
+        code = hash(key)
+        found = None
+        if self.incremental.styles_key == self.__styles_key:
+            found = self.incremental.elements.get(code)
+        if found is None or found[0] != key:
+            found = (key, self.__check_element(node, top_level, prev, following, items, position, location))
+            self.incremental.checked += 1
+        else:
+            self.incremental.reused += 1
+        self.__elements[code] = found
+        if len(found[1]) == 0:
+            return []
+        xpath = location_xpath(location)
+        return [error.moved(position, xpath) for error in found[1]]
+
+    def __check_element(self, node: Node, top_level: bool, prev: Node | None, following: list[Node],
+                        items: list[str], position: int, location: tuple[str, str, int]) -> list[Error]:
+        element = BodyElement(node, top_level, prev, following, items)
+        mask = 0
+        errors = []
+        for check in self.rules.dispatch[node.tag]:
+            for found in check(self, element):
+                if isinstance(found, ErrorSet):
+                    mask |= found._value_
+                elif isinstance(found, ErrorType):
+                    mask |= ERROR_BITS[found]
+                else:
+                    errors.append(found)
+        if mask:
+            errors.insert(0, Error(node.text, error_mask(mask)))
+        if len(errors) != 0:
+            style = style_name(node)
+            xpath = location_xpath(location)
+            for error in errors:
+                error.style = style
+                error.position = position
+                error.xpath = xpath
+        return errors
 
-            self.styleErrors[name_style] = style.collect_errors()
+    def __check_text(self, root: "tree.Elem_xml_tree", xpath: str):
+        top_level = root.parent.tag == "body"
+        # anytree собирает children заново при каждом обращении
+        children = root.children
+        counts = {}
+        for i in range(len(children)):
+            self.__tick()
+            child = children[i]
+            tag = child.xml_elem.tag
+            index = counts[tag] = counts.get(tag, 0) + 1
+            if child.tag in self.rules.dispatch:
+                prev = None
+                following = []
+                items = []
+                if child.tag in self.rules.neighbours:
+                    prev = node_facts(children[i - 1]) if i != 0 else None
+                    following = [node_facts(sibling) for sibling in children[i + 1 : i + 3]]
+                if child.tag in self.rules.items:
+                    items = [node_facts(item).text for item in child.children if item.tag == "list-item"]
+                yield from self.__visit(node_facts(child), top_level, prev, following, items, self.processed,
+                                        (xpath, tag, index))
 
-    def __check_style(self, style_name: str) -> list[ErrorType]: 
+            if child.tag not in INLINE_TAGS:
+                yield from self.__check_text(child, location_xpath((xpath, tag, index)))
+
+    # Потоковый движок: не строит дерево документа целиком. Абзацы и заголовки проверяются,
+    # как только закрылись (и закрылись два их соседа снизу), после чего поддерево выбрасывается.
+    # Ошибки выдаются в том же порядке, что и в __check_text.
+    # counts - сколько детей с каждым тегом было в office:text до этого content (см. check_part);
+    # номера детей office:text копятся в self.tops, число пройденных элементов - в self.started
+    def __stream(self, content, counts=None):
+        # если соседи никому не нужны, элемент проверяется сразу, как закрылся
+        self.__lookahead = 3 if self.rules.neighbours else 1
+        frames = []
+        path = []
+        tags = []
+        inline = 0
+        # номера элементов тела в порядке начала, как у обхода дерева
+        started = 0
+        position = 0
+        location = None
+        self.tops = []
+        for event, elem in ET.iterparse(content, events=("start", "end")):
+            if event == "start":
+                if inline:
+                    inline += 1
+                    continue
+                tag = local_name(elem.tag)
+                if frames:
+                    started += 1
+                    parent = frames[-1]
+                    if parent.top:
+                        self.tops.append(started)
+                    index = parent.counts[elem.tag] = parent.counts.get(elem.tag, 0) + 1
+                    if tag in INLINE_TAGS:
+                        inline = 1
+                        position = started
+                        location = (parent.xpath, elem.tag, index)
+                    else:
+                        frames.append(Frame(elem, tag, False, started, (parent.xpath, elem.tag, index)))
+                elif tag == "text" and len(path) == 2 and path[0] in loader.ROOTS and path[1] == "body":
+                    frames.append(Frame(elem, tag, True, 0, None))
+                    frames[-1].xpath = "/" + "/".join(map(qualified_name, tags + [elem.tag]))
+                    frames[-1].counts = dict(counts or {})
+                path.append(tag)
+                tags.append(elem.tag)
+                continue
+
+            if inline > 1:
+                inline -= 1
+                continue
+            tag = path.pop()
+            tags.pop()
+            if inline:
+                inline = 0
+                node = subtree_facts(tag, elem)
+                del elem[:]
+                self.__stream_child(frames[-1], elem, node, [], [], position, location)
+            elif frames and frames[-1].elem is elem:
+                frame = frames.pop()
+                while frame.window:
+                    self.__resolve(frame)
+                node = frame.close()
+                if frames:
+                    self.__stream_child(frames[-1], elem, node, frame.items, frame.errors, frame.position,
+                                        frame.location)
+                else:
+                    yield from frame.errors
+                    frame.errors.clear()
+            elif len(path) == 1:
+                if tag == "automatic-styles":
+                    self.__load_styles(elem)
+                elif tag == "styles":
+                    self.__load_document_styles(elem)
+                elif tag == "master-styles":
+                    self.__load_document_masters(elem)
+                if tag != "body":
+                    elem.clear()
+
+            if frames and frames[0].errors:
+                yield from frames[0].errors
+                frames[0].errors.clear()
+        self.started = started
+
+    # Часть тела для parallel.py: data - документ, в office:text которого skip соседей сверху, own
+    # своих элементов и соседи снизу. Возвращает ошибки своих элементов и их номера [first, end)
+    # в нумерации этой части; styleErrors и listStyle должны быть уже заполнены.
+    def check_part(self, data: bytes, counts: dict[str, int], skip: int, own: int) -> tuple[list[Error], int, int]:
+        errors = list(self.__stream(io.BytesIO(data), counts))
+        first = self.tops[skip]
+        end = self.tops[skip + own] if skip + own < len(self.tops) else self.started + 1
+        return [error for error in errors if first <= error.position < end], first, end
+
+    # тело по частям в пуле процессов: стили разбирает этот процесс, элементы - пул
+    def __parallel(self, content):
+        import parallel
+        loaders = {"automatic-styles": self.__load_styles, "styles": self.__load_document_styles,
+                   "master-styles": self.__load_document_masters}
+        # у процессов пула архива нет: заголовки всех рисунков читаются заранее
+        if self.rules.pictures and self.document is not None:
+            for name, _, _ in self.document.members(loader.PICTURES):
+                self.picture_info(Picture(name, None, None, None))
+        results = parallel.check_parts(self, content.read(), loaders)
         try:
-            return self.styleErrors[style_name]
-        except:
-            return [ErrorType.INVALID_STYLE]
+            for errors, elements in results:
+                self.processed += elements
+                if self.cancelled is not None and self.cancelled():
+                    raise Cancelled()
+                if self.progress is not None:
+                    self.progress(self.processed)
+                yield from errors
+        finally:
+            results.close()
 
-    def __check_simple_text(self, elem: Elem_xml_tree) -> list[Error]:
-        text = internal_text(elem)
-        if text != "":
-            for _, _, child in RenderTree(elem):
-                if child.tag == "annotation" or child.tag == "annotation-end":
-                    return []
-            errors = []
+    def __stream_child(self, frame: Frame, elem: ET.Element, node: Node, items: list[str], inner: list[Error],
+                       position: int, location: tuple[str, str, int]):
+        self.__tick()
+        if frame.top:
+            del frame.elem[:]
+        else:
+            if frame.pending is not None:
+                pending_elem, pending_node = frame.pending
+                frame.parts.append(pending_node.text)
+                frame.parts.append(pending_elem.tail or "")
+                del frame.elem[0]
+            frame.pending = (elem, node)
+        frame.annotated = frame.annotated or node.annotated
+        frame.image = frame.image or node.image
+        if frame.tag in self.rules.items and node.tag == "list-item":
+            frame.items.append(node.text)
+        frame.window.append(Slot(node, items, inner, position, location))
+        if len(frame.window) == self.__lookahead:
+            self.__resolve(frame)
 
-            for (tag, item) in elem.xml_elem.attrib.items():
-                _, _, tail_tag = tag.partition('}')
-                if tail_tag == "style-name":
-                    errors += self.__check_style(item)
-            if len(errors) != 0:
-                return [Error(text, errors)]
-        return []
+    def __resolve(self, frame: Frame):
+        slot = frame.window.popleft()
+        if slot.node.tag in self.rules.dispatch:
+            following = [next_slot.node for next_slot in frame.window]
+            frame.errors += self.__visit(slot.node, frame.top, frame.prev, following, slot.items, slot.position,
+                                         slot.location)
+        frame.errors += slot.inner
+        frame.prev = slot.node
 
-    def __check_header(self, elem: Elem_xml_tree, next_elem: Elem_xml_tree | None) -> list[Error]:
-        text = internal_text(elem)
-        if text != "":
-            for _, _, child in RenderTree(elem):
-                if child.tag == "annotation" or child.tag == "annotation-end":
-                    return []                
-            errors = []
-            for (tag, item) in elem.xml_elem.attrib.items():
-                _, _, tail_tag = tag.partition('}')
-                if tail_tag == "style-name":
-                    errors += self.__check_style(item)
-            num = ""
-            for i in text:
-                if i.isnumeric():
-                    num += i
-            if text == "" or next_elem is None or text[len(num)] == '.':
-                errors.append(ErrorType.HEADER_NEWLINE)
-            if text[-1] == '.':
-                errors.append(ErrorType.HEADER_DOT)
-            if len(errors) != 0:
-                return [Error(text, errors)]
-        return []
-    
+    def __add_list_style(self, elem: ET.Element):
+        bullet = ""
+        name_style = ""
+        for (tag, item) in elem.attrib.items():
+            if local_name(tag) == "name":
+                name_style = item
+        for child in elem:
+            if local_name(child.tag) == "list-level-style-bullet":
+                bullet = "char"
+            else:
+                bullet = "num"
+            break
+        self.listStyle[name_style] = bullet
 
-    
\ No newline at end of file
+    def __is_valid_style(self, elem: ET.Element, register: bool = True):
+        attributes = style_attributes(elem)
+        family = attributes.get("family", "")
+        parent = attributes.get("parent-style-name")
+        if "master-page-name" in attributes:
+            self.footer_on_first_page = True
+
+        style = self.resolver.apply(family, parent, style_properties(elem))
+        if style.text_align == 'center' and self.resolver.inherits(family, parent, 'Footer'):
+            self.footer = True
+
+        if register:
+            self.styleErrors[attributes.get("name", "")] = self.resolver.collect_errors(style)
+
+    # styles.xml: стили по умолчанию, общие стили (от них наследуются стили из content.xml)
+    # и автоматические стили колонтитулов
+    def __load_common_styles(self, root: ET.Element):
+        for chapter in root:
+            match local_name(chapter.tag):
+                case "styles":
+                    self.__load_office_styles(chapter)
+                case "automatic-styles":
+                    for child in chapter:
+                        match local_name(child.tag):
+                            case "style":
+                                self.__is_valid_style(child, register=False)
+                            case "page-layout":
+                                self.__add_page_layout(child)
+                case "master-styles":
+                    self.__load_master_styles(chapter)
+
+    def __load_office_styles(self, elem: ET.Element):
+        for child in elem:
+            match local_name(child.tag):
+                case "default-style":
+                    self.resolver.add_default(child)
+                case "style":
+                    self.resolver.add(child)
+                case "list-style":
+                    self.__add_list_style(child)
+        for (family, name), (parent, _) in self.resolver.declared.items():
+            style = self.resolver.resolve(family, name)
+            if family == "paragraph":
+                self.styleErrors[name] = self.resolver.collect_errors(style)
+            if style.text_align == 'center' and self.resolver.inherits(family, parent, 'Footer'):
+                self.footer = True
+
+    # office:styles плоского документа (в .odt они в styles.xml): идут в нём раньше автоматических стилей
+    # и тела, а автоматические стили колонтитулов лежат вместе с остальными в office:automatic-styles
+    def __load_document_styles(self, elem: ET.Element):
+        start = time.perf_counter()
+        if self.incremental is not None:
+            self.__styles_key += digest(ET.tostring(elem))
+        self.__load_office_styles(elem)
+        self.__phase("styles.xml", start, len(self.resolver.declared))
+
+    # ширина области текста: ширина страницы без полей
+    def __add_page_layout(self, elem: ET.Element):
+        width = None
+        for child in elem:
+            if local_name(child.tag) == "page-layout-properties":
+                properties = style_attributes(child)
+                page = units.to_mm(properties.get("page-width"))
+                margin = units.to_mm(properties.get("margin", "0cm")) or 0.0
+                left = units.to_mm(properties.get("margin-left")) if "margin-left" in properties else margin
+                right = units.to_mm(properties.get("margin-right")) if "margin-right" in properties else margin
+                if page is not None:
+                    width = page - (left or 0.0) - (right or 0.0)
+        self.pageLayouts[style_attributes(elem).get("name", "")] = width
+
+    # разметка основной страницы (Standard, иначе первой): титульный лист и другие страницы
+    # со своей разметкой рисунков обычно не содержат
+    def __load_master_styles(self, elem: ET.Element):
+        layouts = {}
+        for child in elem:
+            if local_name(child.tag) == "master-page":
+                attributes = style_attributes(child)
+                layouts.setdefault(attributes.get("name", ""), attributes.get("page-layout-name"))
+        if len(layouts) != 0:
+            layout = layouts.get("Standard", next(iter(layouts.values())))
+            self.text_width = self.pageLayouts.get(layout)
+
+    # office:master-styles плоского документа (в .odt они в styles.xml)
+    def __load_document_masters(self, elem: ET.Element):
+        if self.incremental is not None:
+            self.__styles_key += digest(ET.tostring(elem))
+        self.__load_master_styles(elem)
+
+    # заголовок файла рисунка: из архива читается один раз на проверку и не дальше images.HEADER_LIMIT
+    def picture_info(self, picture: Picture) -> "images.ImageInfo | None":
+        import images
+        if picture.data is not None:
+            return images.read_info(io.BytesIO(picture.data))
+        if picture.name is None:
+            return None
+        if picture.name not in self.pictures:
+            info = None
+            if self.document is not None and self.document.has(picture.name):
+                with self.document.open(picture.name) as stream:
+                    info = images.read_info(stream)
+            self.pictures[picture.name] = info
+        return self.pictures[picture.name]
+
+    def style_errors(self, style_name: str) -> ErrorSet: 
+        try:
+            return self.styleErrors[style_name]
+        except:
+            return ErrorSet.INVALID_STYLE
@@ -0,0 +1,81 @@
+import json
+import os
+import socket
+from urllib.parse import quote
+
+# Клиент сервера проверки (server.py). Импортирует только стандартную библиотеку,
+# чтобы переадресация запроса стоила дешевле, чем проверка на месте; urllib.request
+# (с http.client и email) загружается, только когда сервер действительно запущен.
+
+ADDRESS_ENV = "STYLECHECKER_SERVER"
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+def default_address() -> str:
+    return os.environ.get(ADDRESS_ENV) or DEFAULT_ADDRESS
+
+
+def split_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+class ServerError(Exception):
+    pass
+
+
+# сервер перестал отвечать после available(): упал, перезапускается или не уложился в timeout
+class ServerUnavailable(Exception):
+    pass
+
+
+class Client:
+    address: str
+    url: str
+    timeout: float | None
+
+    def __init__(self, address: str | None = None, timeout: float | None = None):
+        self.address = address or default_address()
+        self.url = "http://" + self.address
+        self.timeout = timeout
+
+    # сервер запущен и отвечает; ждать долго не имеет смысла - без него проверим на месте
+    def available(self, timeout: float = 0.5) -> bool:
+        try:
+            socket.create_connection(split_address(self.address), timeout).close()
+        except (OSError, ValueError):
+            return False
+        import urllib.request
+        try:
+            with urllib.request.urlopen(self.url + "/health", timeout=timeout) as response:
+                return json.load(response).get("status") == "ok"
+        except (OSError, ValueError):
+            return False
+
+    # пути к файлам, абсолютные; каталоги и шаблоны сервер не раскрывает (loader.collect_files)
+    def check_paths(self, paths: list[str], disabled: list[str] = ()) -> dict:
+        request = {"paths": [os.path.abspath(path) for path in paths], "disable": list(disabled)}
+        return self.__post("/check", json.dumps(request).encode(), "application/json")
+
+    def check_data(self, name: str, data: bytes, disabled: list[str] = ()) -> dict:
+        query = f"/check?name={quote(name)}&disable={quote(','.join(disabled))}"
+        return self.__post(query, data, "application/vnd.oasis.opendocument.text")
+
+    def __post(self, path: str, body: bytes, content_type: str) -> dict:
+        import http.client
+        import urllib.error
+        import urllib.request
+        request = urllib.request.Request(self.url + path, data=body, method="POST",
+                                         headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as exc:
+            try:
+                message = json.load(exc)["error"]
+            except (OSError, ValueError, KeyError, TypeError):
+                message = str(exc)
+            raise ServerError(message) from exc
+        # URLError, ConnectionError, socket.timeout; оборванный ответ - HTTPException или неполный JSON
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            raise ServerUnavailable(str(exc)) from exc
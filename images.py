@@ -0,0 +1,181 @@
+import base64
+import binascii
+import struct
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+# Размеры рисунков по заголовкам их файлов, без декодирования самой картинки: у PNG - чанки
+# IHDR и pHYs, у JPEG - JFIF и маркер SOF, у SVG - только корень. Из файла читается не больше
+# HEADER_LIMIT байт, так что документ с сотнями больших рисунков стоит килобайты чтения.
+
+# больше этого из файла рисунка не читается
+HEADER_LIMIT = 256 * 1024
+# по сколько байт SVG отдаётся парсеру
+CHUNK = 4096
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# маркеры SOF с размерами кадра: все 0xC0-0xCF, кроме DHT, JPG и DAC
+JPEG_FRAMES = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass(frozen=True, slots=True)
+class ImageInfo:
+    format: str
+    # пиксели растрового рисунка, у SVG - None
+    width: int | None
+    height: int | None
+    # точек на дюйм по горизонтали и вертикали, если они записаны в файле
+    dpi: tuple[float, float] | None
+
+
+class Truncated(Exception):
+    pass
+
+
+# чтение начала файла: не дальше limit байт, пропуски - без чтения, если поток это умеет;
+# unread возвращает прочитанное, чтобы его прочитать ещё раз
+class Header:
+    def __init__(self, stream, limit: int):
+        self.stream = stream
+        self.left = limit
+        self.buffer = b""
+        self.seekable = hasattr(stream, "seekable") and stream.seekable()
+
+    def unread(self, data: bytes):
+        self.buffer = data + self.buffer
+
+    def read(self, size: int) -> bytes:
+        data = self.read_some(size)
+        if len(data) < size:
+            raise Truncated()
+        return data
+
+    def read_some(self, size: int) -> bytes:
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        size -= len(data)
+        if size == 0:
+            return data
+        if size > self.left:
+            raise Truncated()
+        chunk = self.stream.read(size)
+        self.left -= len(chunk)
+        return data + chunk
+
+    def skip(self, size: int):
+        if size < 0:
+            raise Truncated()
+        buffered = min(size, len(self.buffer))
+        self.buffer = self.buffer[buffered:]
+        size -= buffered
+        if size > self.left:
+            raise Truncated()
+        if self.seekable:
+            self.stream.seek(size, 1)
+            self.left -= size
+        else:
+            while size > 0:
+                size -= len(self.read(min(size, CHUNK)))
+
+
+# None - формат не знаком (GIF, WMF, ...) или заголовок повреждён
+def read_info(stream, limit: int = HEADER_LIMIT) -> ImageInfo | None:
+    header = Header(stream, limit)
+    try:
+        start = header.read_some(8)
+        if start == PNG_SIGNATURE:
+            return png_info(header)
+        if start[:2] == b"\xff\xd8":
+            header.unread(start[2:])
+            return jpeg_info(header)
+        if start.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+            return svg_info(header, start)
+    except (Truncated, struct.error, ET.ParseError):
+        pass
+    return None
+
+
+def png_info(header: Header) -> ImageInfo | None:
+    width = height = dpi = None
+    try:
+        while True:
+            length, kind = struct.unpack(">I4s", header.read(8))
+            if kind == b"IHDR":
+                width, height = struct.unpack(">II", header.read(8))
+                header.skip(length - 8 + 4)
+            elif kind == b"pHYs":
+                x, y, unit = struct.unpack(">IIB", header.read(9))
+                # единица 1 - метр, 0 - только соотношение сторон
+                if unit == 1:
+                    dpi = (x * 0.0254, y * 0.0254)
+                header.skip(length - 9 + 4)
+            elif kind in (b"IDAT", b"IEND"):
+                # pHYs идёт раньше данных картинки
+                break
+            else:
+                header.skip(length + 4)
+    except Truncated:
+        if width is None:
+            raise
+    if width is None:
+        return None
+    return ImageInfo("png", width, height, dpi)
+
+
+def jpeg_info(header: Header) -> ImageInfo | None:
+    dpi = None
+    while True:
+        if header.read(1) != b"\xff":
+            return None
+        marker = header.read(1)[0]
+        while marker == 0xFF:
+            marker = header.read(1)[0]
+        # маркеры без длины
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        # конец файла или начало сжатых данных раньше SOF
+        if marker in (0xD9, 0xDA):
+            return None
+        length = struct.unpack(">H", header.read(2))[0] - 2
+        if marker == 0xE0 and length >= 12:
+            segment = header.read(12)
+            header.skip(length - 12)
+            if segment[:5] == b"JFIF\0":
+                unit, x, y = struct.unpack(">BHH", segment[7:12])
+                # единица 1 - точки на дюйм, 2 - на сантиметр, 0 - только соотношение сторон
+                if unit == 1:
+                    dpi = (float(x), float(y))
+                elif unit == 2:
+                    dpi = (x * 2.54, y * 2.54)
+        elif marker in JPEG_FRAMES:
+            _, height, width = struct.unpack(">BHH", header.read(5))
+            return ImageInfo("jpeg", width, height, dpi)
+        else:
+            header.skip(length)
+
+
+def svg_info(header: Header, start: bytes) -> ImageInfo | None:
+    parser = ET.XMLPullParser(events=("start",))
+    chunk = start
+    while chunk:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            # векторному рисунку разрешение не нужно, а ширину рисунка в тексте задаёт рамка
+            if elem.tag.rpartition("}")[2] != "svg":
+                return None
+            return ImageInfo("svg", None, None, None)
+        chunk = header.read_some(min(CHUNK, header.left))
+    return None
+
+
+# начало рисунка, встроенного в плоский документ (office:binary-data, base64): для заголовка
+# хватает первых HEADER_LIMIT байт
+def embedded(text: str, limit: int = HEADER_LIMIT) -> bytes:
+    chars = limit * 4 // 3
+    # переносы строк внутри base64 не считаются
+    encoded = "".join(text[:chars + chars // 64 + 4].split())[:chars]
+    encoded = encoded[:len(encoded) // 4 * 4]
+    try:
+        return base64.b64decode(encoded)
+    except (binascii.Error, ValueError):
+        return b""
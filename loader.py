@@ -0,0 +1,129 @@
+import glob
+import io
+import os
+import zipfile
+
+CONTENT = "content.xml"
+STYLES = "styles.xml"
+# каталог рисунков в архиве
+PICTURES = "Pictures/"
+
+# расширения документов, которые умеет проверять программа
+EXTENSIONS = (".odt", ".fodt")
+# корни XML документа: content.xml архива и плоский .fodt
+ROOTS = ("document-content", "document")
+
+
+# файлы документов по путям, каталогам (рекурсивно) и шаблонам; явно заданный файл берётся как есть
+def collect_files(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in EXTENSIONS:
+                files += glob.glob(os.path.join(glob.escape(path), "**", "*" + extension), recursive=True)
+        elif glob.has_magic(path):
+            files += [file for file in glob.glob(path, recursive=True) if file.endswith(EXTENSIONS)]
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+class NotDocument(ValueError):
+    pass
+
+
+# в документе нет нужной части (content.xml, styles.xml); KeyError, как у zipfile
+class MissingPart(KeyError):
+    def __init__(self, member: str):
+        super().__init__(member)
+        self.member = member
+
+
+# поток вызывающего: читается, но закрывать его не нам
+class Borrowed:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+# Открывает из документа только нужные части, ничего не распаковывая на диск.
+# Источник - путь до файла, bytes или файлоподобный объект; архив .odt и плоский XML (.fodt)
+# различаются по первым байтам. У плоского документа одна часть: он целиком отдаётся как
+# content.xml и читается парсером прямо из файла, общие стили лежат в нём же.
+class Document:
+    archive: zipfile.ZipFile | None
+    flat: bool
+
+    def __init__(self, source):
+        self.owned = None
+        self.archive = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        elif isinstance(source, (str, os.PathLike)):
+            source = self.owned = open(source, "rb")
+        elif not (hasattr(source, "seekable") and source.seekable()):
+            source = io.BytesIO(source.read())
+        start = source.tell()
+        head = source.read(64)
+        source.seek(start)
+        self.flat = not head.startswith(b"PK")
+        if not self.flat:
+            self.archive = zipfile.ZipFile(source)
+        elif not head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+            self.close()
+            raise NotDocument("not an ODF document")
+        self.source = source
+
+    def has(self, member: str) -> bool:
+        if self.flat:
+            return member == CONTENT
+        try:
+            self.archive.getinfo(member)
+        except KeyError:
+            return False
+        return True
+
+    # (имя, размер, CRC32) частей архива в каталоге prefix - из оглавления, без чтения самих частей;
+    # у плоского документа рисунки встроены в XML, частей нет
+    def members(self, prefix: str) -> list[tuple[str, int, int]]:
+        if self.flat:
+            return []
+        return [(info.filename, info.file_size, info.CRC) for info in self.archive.infolist()
+                if info.filename.startswith(prefix) and not info.is_dir()]
+
+    def open(self, member: str):
+        if not self.flat:
+            try:
+                return self.archive.open(member)
+            except KeyError:
+                raise MissingPart(member) from None
+        if member != CONTENT:
+            raise MissingPart(member)
+        return self.source if self.source is self.owned else Borrowed(self.source)
+
+    def read(self, member: str) -> bytes:
+        with self.open(member) as stream:
+            return stream.read()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+        if self.owned is not None:
+            self.owned.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
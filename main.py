@@ -1,17 +1,311 @@
-import checker
+import argparse
+import os
 import sys
+import time
+import client
 
-if len(sys.argv) == 2 and sys.argv[1][-4:] == ".odt":
-    check = checker.StyleChecker(sys.argv[1])
-    errors = []
+# коды выхода: ошибки оформления найдены; хотя бы один файл не удалось проверить
+EXIT_OK = 0
+EXIT_ERRORS = 1
+EXIT_FAILED = 2
+
+
+def exit_code(found: bool, failed: bool) -> int:
+    if failed:
+        return EXIT_FAILED
+    return EXIT_ERRORS if found else EXIT_OK
+
+
+# проверка на месте: тяжёлые модули нужны только здесь, при работающем сервере они не загружаются
+# split - число процессов, если документ проверяется по частям (--split);
+# record - список, куда сложить batch.Result для --store
+def check_single(path: str, result_cache, profile: bool, disabled: list[str], group: str | None,
+                 split: int | None = None, record: list | None = None, style_profile=None):
+    import batch
+    import checker
+    import report
+    check = checker.StyleChecker(path, streaming=True, cache=result_cache, profile=profile, disabled=disabled,
+                                 jobs=split, style_profile=style_profile)
+    grouper = report.Grouper(group, check.rules.rules) if group is not None else None
+    result = batch.Result(path, [], None)
+    for error in batch.stream_errors(check.iter_errors(), result):
+        if grouper is None:
+            print(error.pretty(style_profile), flush=True)
+        else:
+            grouper.add(error)
+    if record is not None:
+        record.append(result)
+    if result.failure is not None:
+        print(result.failure)
+        return EXIT_FAILED
+    found = len(result.errors) != 0
+    if grouper is not None:
+        for item in grouper.result():
+            print(item.pretty(style_profile))
+    if not found:
+        print("все верно")
+    if profile:
+        print(check.stats.pretty(), file=sys.stderr)
+    return exit_code(found, False)
+
+
+def check_many(files: list[str], jobs: int | None, result_cache, profile: bool, disabled: list[str],
+               group: str | None, record: list | None = None, style_profile=None):
+    import batch
+    import report
+    start = time.perf_counter()
+    results = []
+    for result in batch.check_files(files, jobs, result_cache, profile, disabled, hashed=record is not None,
+                                    style_profile=style_profile):
+        results.append(result)
+        print(f"=== {result.path} ===")
+        if result.failure is not None:
+            print(result.failure)
+        elif len(result.errors) == 0:
+            print("все верно")
+        elif group is not None:
+            for item in report.group_errors(result.errors, group):
+                print(item.pretty(style_profile))
+        else:
+            for error in result.errors:
+                print(error.pretty(style_profile))
+        if result.stats is not None:
+            print(result.stats.pretty(), file=sys.stderr)
+        print(flush=True)
+    summary = batch.summarize(results, time.perf_counter() - start)
+    print(summary.pretty())
+    if record is not None:
+        record += results
+    return exit_code(summary.with_errors != 0, summary.failed != 0)
+
+
+# json-строки или SARIF: ошибки одного файла пишутся по мере проверки, нескольких - по мере готовности файлов
+def check_structured(files: list[str], jobs: int | None, result_cache, disabled: list[str], writer,
+                     split: int | None = None, record: list | None = None, style_profile=None) -> int:
+    import batch
+    import checker
+    import loader
+    found = False
+    failed = False
+    if len(files) == 1 and files[0].endswith(loader.EXTENSIONS):
+        errors = checker.StyleChecker(files[0], streaming=True, cache=result_cache, disabled=disabled,
+                                      jobs=split, style_profile=style_profile).iter_errors()
+        result = batch.Result(files[0], [], None)
+        for error in batch.stream_errors(errors, result):
+            writer.error(files[0], error)
+        found = len(result.errors) != 0
+        if result.failure is not None:
+            failed = True
+            writer.failure(files[0], result.failure)
+        if record is not None:
+            record.append(result)
+    else:
+        for result in batch.check_files(files, jobs, result_cache, False, disabled, hashed=record is not None,
+                                        style_profile=style_profile):
+            if record is not None:
+                record.append(result)
+            if result.failure is not None:
+                failed = True
+                writer.failure(result.path, result.failure)
+            for error in result.errors:
+                found = True
+                writer.error(result.path, error)
+    writer.close()
+    return exit_code(found, failed)
+
+
+def watch_file(path: str, disabled: list[str], style_profile=None):
+    import watch
+
+    def changed(change):
+        if change.first:
+            for error in change.errors:
+                print(error.pretty(style_profile))
+            if len(change.errors) == 0:
+                print("все верно")
+            print(f"\nСлежу за изменениями {path} (Ctrl+C - выход)", flush=True)
+            return
+        if len(change.added) == 0 and len(change.resolved) == 0:
+            print(f"--- {time.strftime('%H:%M:%S')}: ошибки не изменились ---", flush=True)
+            return
+        print(f"\n--- {time.strftime('%H:%M:%S')}: новых ошибок {len(change.added)}, "
+              f"исправлено {len(change.resolved)}, всего {len(change.errors)} ---")
+        if len(change.added) != 0:
+            print("Новые ошибки:")
+            for error in change.added:
+                print(error.pretty(style_profile))
+        if len(change.resolved) != 0:
+            print("Исправлено:")
+            for error in change.resolved:
+                print(error.pretty(style_profile))
+        sys.stdout.flush()
+
+    watcher = watch.Watcher(path, disabled, style_profile)
     try:
-        errors = check.run()
-    except Exception:
-        print("Файл не существует.")
-    if len(errors) == 0:
+        watch.watch(watcher, changed)
+    except KeyboardInterrupt:
+        pass
+
+
+def print_result(result: dict):
+    if result["failure"] is not None:
+        print(result["failure"])
+    elif len(result["errors"]) == 0:
         print("все верно")
     else:
-        for error in errors:
-            print(error.pretty())
-else:
-    print("Файл не был введен или имеет неверное расширение")
\ No newline at end of file
+        for error in result["errors"]:
+            print(error["pretty"])
+
+
+# Отправляет проверку серверу (server.py), если он запущен. Вывод тот же, что и при проверке на месте.
+# Каталоги и шаблоны раскрываются здесь, серверу уходят только пути к файлам.
+# None - сервер перестал отвечать, проверять надо на месте.
+def forward(daemon: client.Client, paths: list[str], disabled: list[str]) -> int | None:
+    import loader
+    files = loader.collect_files(paths)
+    if len(files) == 0:
+        print("Файл не был введен или имеет неверное расширение")
+        return EXIT_FAILED
+    try:
+        response = daemon.check_paths(files, disabled)
+    except client.ServerUnavailable:
+        return None
+    except client.ServerError as exc:
+        print(exc)
+        return EXIT_FAILED
+    results = response["results"]
+    code = exit_code(any(result["errors"] for result in results),
+                     any(result["failure"] is not None for result in results))
+    if len(paths) == 1 and [result["path"] for result in results] == [os.path.abspath(paths[0])]:
+        if results[0]["path"].endswith(loader.EXTENSIONS):
+            print_result(results[0])
+        else:
+            print("Файл не был введен или имеет неверное расширение")
+            return EXIT_FAILED
+    else:
+        for result in results:
+            path = os.path.relpath(result["path"])
+            print(f"=== {result['path'] if path.startswith('..') else path} ===")
+            print_result(result)
+            print(flush=True)
+        print(response["summary"])
+    return code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка оформления ODT-файлов по ГОСТ 2.105",
+                                     epilog="Код выхода: 0 - ошибок нет, 1 - найдены ошибки оформления, "
+                                            "2 - хотя бы один файл не удалось проверить.")
+    parser.add_argument("paths", nargs="*", help="файлы .odt и .fodt, каталоги или шаблоны (*.odt)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="число процессов для пакетной проверки (по умолчанию - число ядер)")
+    parser.add_argument("--split", action="store_true",
+                        help="проверить один большой файл по частям в -j процессах")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать сохранённые результаты проверок")
+    parser.add_argument("--clear-cache", action="store_true", help="очистить сохранённые результаты проверок")
+    parser.add_argument("--profile", action="store_true",
+                        help="вывести в stderr время и счётчики по этапам и правилам (кэш не используется)")
+    parser.add_argument("--disable", nargs="+", default=[], metavar="RULE",
+                        help="не запускать указанные правила: style, image, figure, header, list, footer, "
+                             "table-of-contents")
+    parser.add_argument("--no-server", action="store_true",
+                        help="проверять на месте, даже если запущен сервер проверки (server.py)")
+    parser.add_argument("--watch", action="store_true",
+                        help="проверять файл заново после каждого сохранения и выводить только изменения")
+    parser.add_argument("--group", choices=["style", "rule"], default=None,
+                        help="выводить ошибки группами с числом случаев: по стилю и набору ошибок или по правилу")
+    parser.add_argument("--format", choices=["text", "jsonl", "sarif"], default="text",
+                        help="формат вывода: текст, JSON Lines (запись на каждую ошибку) или SARIF 2.1.0")
+    parser.add_argument("--exit-zero", action="store_true",
+                        help="код выхода 0, даже если найдены ошибки оформления")
+    parser.add_argument("--style-profile", default=None, metavar="NAME",
+                        help="профиль оформления абзацев из файла профилей (по умолчанию ГОСТ 2.105)")
+    parser.add_argument("--profiles", default=None, metavar="FILE",
+                        help="файл профилей JSON (по умолчанию ~/.config/stylechecker/profiles.json)")
+    parser.add_argument("--store", nargs="?", const="", default=None, metavar="DB",
+                        help="сохранить результаты в базу SQLite для запросов через store.py "
+                             "(по умолчанию ~/.local/share/stylechecker/results.sqlite)")
+    args = parser.parse_args()
+    if args.format != "text" and (args.group or args.watch or args.profile):
+        parser.error("--format jsonl/sarif нельзя совмещать с --group, --watch и --profile")
+    if args.split and args.watch:
+        parser.error("--split нельзя совмещать с --watch")
+    if args.store is not None and args.watch:
+        parser.error("--store нельзя совмещать с --watch")
+
+    code = EXIT_OK
+    if len(args.paths) != 0 and not (args.no_server or args.no_cache or args.clear_cache or args.profile
+                                     or args.watch or args.group or args.format != "text" or args.split
+                                     or args.store is not None or args.style_profile or args.profiles):
+        daemon = client.Client()
+        if daemon.available():
+            code = forward(daemon, args.paths, args.disable)
+            if code is not None:
+                return EXIT_OK if args.exit_zero and code == EXIT_ERRORS else code
+            code = EXIT_OK
+
+    import batch
+    import cache
+    import checker
+    import loader
+    names = [rule.name for rule in checker.DEFAULT_RULES]
+    unknown = [rule for rule in args.disable if rule not in names]
+    if len(unknown) != 0:
+        parser.error(f"неизвестные правила: {', '.join(unknown)}")
+    style_profile = None
+    if args.style_profile is not None or args.profiles is not None:
+        import profiles
+        try:
+            style_profile = profiles.get(args.style_profile, args.profiles)
+        except profiles.ProfileError as exc:
+            parser.error(str(exc))
+
+    result_cache = None if args.no_cache or args.profile else cache.ResultCache()
+    if args.clear_cache:
+        cache.ResultCache().clear()
+        if len(args.paths) == 0:
+            print("Кэш очищен")
+            return EXIT_OK
+
+    files = loader.collect_files(args.paths)
+    record = [] if args.store is not None else None
+    split = None
+    if args.split:
+        if len(files) != 1 or args.paths != files:
+            parser.error("--split проверяет по частям один файл")
+        split = args.jobs or os.cpu_count() or 1
+    if args.watch:
+        if len(files) != 1 or args.paths != files or not files[0].endswith(loader.EXTENSIONS):
+            parser.error("--watch следит за одним файлом .odt или .fodt")
+        watch_file(files[0], args.disable, style_profile)
+    elif len(files) == 0:
+        print("Файл не был введен или имеет неверное расширение", file=sys.stderr if args.format != "text" else None)
+        code = EXIT_FAILED
+    elif args.format != "text":
+        import report
+        writer = report.WRITERS[args.format](sys.stdout, profile=style_profile)
+        code = check_structured(files, args.jobs, result_cache, args.disable, writer, split, record, style_profile)
+    elif args.paths == files and len(files) == 1:
+        if files[0].endswith(loader.EXTENSIONS):
+            code = check_single(files[0], result_cache, args.profile, args.disable, args.group, split, record,
+                                style_profile)
+        else:
+            print("Файл не был введен или имеет неверное расширение")
+            code = EXIT_FAILED
+    else:
+        code = check_many(files, args.jobs, result_cache, args.profile, args.disable, args.group, record,
+                          style_profile)
+    if record:
+        import store
+        with store.ResultStore(args.store or None) as results:
+            results.add_run(record, args.disable, profile=args.style_profile)
+    return EXIT_OK if args.exit_zero and code == EXIT_ERRORS else code
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # читатель вывода закрылся раньше (| head): остаток вывода некуда писать, в том числе при выходе
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(EXIT_FAILED)
@@ -0,0 +1,206 @@
+import re
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+from collections import deque
+from dataclasses import dataclass
+import checker
+import loader
+
+# Проверка одного большого документа в нескольких процессах. Этот процесс один раз проходит
+# content.xml парсером expat без построения дерева: разбирает стили и режет детей office:text
+# на части по байтам. Часть уходит в пул вместе с соседями (один сверху, два снизу - столько
+# видят правила с NEIGHBOURS), процесс пула проверяет её потоковым движком с уже готовой
+# таблицей стилей и возвращает ошибки только своих элементов. Ошибки собираются в порядке
+# частей, номера элементов сдвигаются на число элементов в предыдущих частях - выходит то же,
+# что и при проверке одним процессом.
+
+# соседи части сверху и снизу
+BEFORE = 1
+AFTER = 2
+# части не мельче этого, байт
+PART_SIZE = 256 * 1024
+# сколько частей на процесс: чем больше, тем ровнее нагрузка
+PARTS_PER_JOB = 4
+# по сколько байт content.xml отдаётся парсеру между проверками готовых частей
+FEED = 1024 * 1024
+
+TAG = re.compile(rb"<[^>\"']*(?:(?:\"[^\"]*\"|'[^']*')[^>\"']*)*>")
+NAME = re.compile(rb"</?([^\s/>]+)")
+
+
+@dataclass
+class Part:
+    data: bytes
+    counts: dict[str, int]
+    skip: int
+    own: int
+
+
+# конец тега, который начинается в data[start]
+def tag_end(data: bytes, start: int) -> int:
+    return TAG.match(data, start).end()
+
+
+def closing(tag: bytes) -> bytes:
+    return b"</" + NAME.match(tag).group(1) + b">"
+
+
+# Режет content.xml на части. Стили верхнего уровня (automatic-styles и, у плоского документа,
+# styles) разбираются по дороге функциями из loaders, до того как отдана первая часть.
+class Splitter:
+    def __init__(self, data: bytes, loaders: dict, size: int):
+        self.data = data
+        self.loaders = loaders
+        self.size = size
+        self.parser = xml.parsers.expat.ParserCreate(namespace_separator="}")
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.path = []
+        self.starts = []
+        # открывающие теги корня, office:body и office:text
+        self.tags = []
+        # начало документа до конца открывающего тега корня
+        self.root = b""
+        # то, во что заворачивается часть: корень, office:body и office:text
+        self.head = b""
+        self.tail = b""
+        # дети office:text: начало, конец и тег, как у ElementTree
+        self.begins = []
+        self.ends = []
+        self.names = []
+        self.inside = False
+        self.finished = False
+        self.first = 0
+        self.counted = 0
+        self.counts = {}
+
+    def start(self, name: str, attrib):
+        index = self.parser.CurrentByteIndex
+        if self.inside:
+            if len(self.path) == 3:
+                self.begins.append(index)
+                self.names.append("{" + name if "}" in name else name)
+            self.path.append(None)
+            return
+        local = name.rpartition("}")[2]
+        self.path.append(local)
+        self.starts.append(index)
+        if len(self.path) == 1 or self.path[1:] == ["body"] or self.path[1:] == ["body", "text"]:
+            self.tags.append(self.data[index:tag_end(self.data, index)])
+        if len(self.path) == 1:
+            self.root = self.data[:tag_end(self.data, index)]
+        if len(self.path) == 3 and self.path[0] in loader.ROOTS and self.path[1:] == ["body", "text"]:
+            self.inside = True
+            self.head = self.root + self.tags[1] + self.tags[2]
+            self.tail = b"".join(closing(tag) for tag in reversed(self.tags))
+
+    def end(self, name: str):
+        index = self.parser.CurrentByteIndex
+        local = self.path.pop()
+        if self.inside:
+            if len(self.path) == 3:
+                self.ends.append(self.element_end(self.begins[-1], index))
+            elif len(self.path) == 2:
+                self.inside = False
+                self.finished = True
+                self.starts.pop()
+            return
+        start = self.starts.pop()
+        if len(self.path) == 1 and local in self.loaders:
+            end = self.element_end(start, index)
+            root = ET.fromstring(self.root + self.data[start:end] + closing(self.tags[0]))
+            self.loaders[local](root[0])
+
+    # о конце пустого элемента (<a/>) expat сообщает уже после его тега, об остальных - в начале
+    # закрывающего тега
+    def element_end(self, start: int, index: int) -> int:
+        end = tag_end(self.data, start)
+        if index == end and self.data[end - 2:end] == b"/>":
+            return end
+        return tag_end(self.data, index)
+
+    def parts(self):
+        try:
+            for offset in range(0, len(self.data), FEED):
+                self.parser.Parse(self.data[offset:offset + FEED], False)
+                yield from self.ready()
+            self.parser.Parse(b"", True)
+        except xml.parsers.expat.ExpatError as exc:
+            raise ET.ParseError(str(exc)) from exc
+        yield from self.ready()
+
+    # части, у которых закрылись все свои элементы и соседи снизу
+    def ready(self):
+        done = len(self.ends)
+        while self.first < done:
+            last = self.first
+            while last + 1 < done and self.ends[last] - self.begins[self.first] < self.size:
+                last += 1
+            if not self.finished and (self.ends[last] - self.begins[self.first] < self.size or last + AFTER >= done):
+                return
+            yield self.part(self.first, last, done)
+            self.first = last + 1
+
+    def part(self, first: int, last: int, done: int) -> Part:
+        begin = max(first - BEFORE, 0)
+        end = min(last + AFTER, done - 1)
+        while self.counted < begin:
+            tag = self.names[self.counted]
+            self.counts[tag] = self.counts.get(tag, 0) + 1
+            self.counted += 1
+        return Part(self.head + self.data[self.begins[begin]:self.ends[end]] + self.tail, dict(self.counts),
+                    first - begin, last - first + 1)
+
+
+# таблица стилей, правила, ширина области текста и заголовки рисунков в процессе пула:
+# передаются один раз, при его запуске
+shared = None
+
+
+def start_worker(styles: dict, lists: dict, rules: list, text_width: float | None, pictures: dict):
+    global shared
+    shared = (styles, lists, rules, text_width, pictures)
+
+
+def check_part(part: Part) -> tuple[list[checker.Error], int, int, bool]:
+    styles, lists, rules, text_width, pictures = shared
+    check = checker.StyleChecker(None, rules=rules)
+    check.styleErrors = styles
+    check.listStyle = lists
+    check.text_width = text_width
+    check.pictures = pictures
+    errors, first, end = check.check_part(part.data, part.counts, part.skip, part.own)
+    return errors, first, end, check.table_of_contents
+
+
+# (ошибки, число элементов) по частям в порядке документа
+def check_parts(check: "checker.StyleChecker", data: bytes, loaders: dict):
+    from concurrent.futures import ProcessPoolExecutor
+    size = max(PART_SIZE, len(data) // (check.jobs * PARTS_PER_JOB))
+    pool = None
+    pending = deque()
+    offset = 0
+    try:
+        for part in Splitter(data, loaders, size).parts():
+            if pool is None:
+                # стили к этому моменту разобраны: они идут в content.xml раньше тела
+                pool = ProcessPoolExecutor(max_workers=check.jobs, initializer=start_worker,
+                                           initargs=(check.styleErrors, check.listStyle, check.rules.rules,
+                                                     check.text_width, check.pictures))
+            pending.append(pool.submit(check_part, part))
+            while pending and pending[0].done():
+                offset = yield from merge(check, pending.popleft().result(), offset)
+        while pending:
+            offset = yield from merge(check, pending.popleft().result(), offset)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def merge(check: "checker.StyleChecker", result: tuple, offset: int):
+    errors, first, end, table_of_contents = result
+    for error in errors:
+        error.position += offset - first + 1
+    check.table_of_contents = check.table_of_contents or table_of_contents
+    yield errors, end - first
+    return offset + end - first
@@ -0,0 +1,91 @@
+import dataclasses
+import json
+import os
+import checker
+import units
+
+# Профили оформления из файла JSON (по умолчанию ~/.config/stylechecker/profiles.json):
+#
+#     {"кафедра ВТ": {"size": "12pt", "text_indent": "1cm", "tolerance": 0.2},
+#      "кафедра ВТ, диплом": {"base": "кафедра ВТ", "font": "PT Serif"}}
+#
+# Незаданные поля берутся из профиля base, а без него - из ГОСТ 2.105 (checker.GOST_2_105).
+# Файл читается один раз на процесс, к сравнению профиль готовит checker.compile_profile.
+
+BUILTIN = {checker.GOST_2_105.name: checker.GOST_2_105}
+FIELDS = {field.name for field in dataclasses.fields(checker.StyleProfile)} - {"name"}
+TOLERANCES = ("tolerance", "size_tolerance")
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def default_path() -> str:
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "stylechecker", "profiles.json")
+
+
+# имя -> профиль: встроенные и из файла path (по умолчанию default_path(), его может и не быть)
+loaded = {}
+
+def load(path: str | None = None) -> dict[str, checker.StyleProfile]:
+    explicit = path is not None
+    path = path or default_path()
+    if path in loaded:
+        return loaded[path]
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        if explicit:
+            raise ProfileError(f"файл профилей {path} не найден") from None
+        data = {}
+    except (OSError, ValueError) as exc:
+        raise ProfileError(f"не удалось прочитать профили из {path}: {exc}") from None
+    if not isinstance(data, dict) or not all(isinstance(spec, dict) for spec in data.values()):
+        raise ProfileError(f"{path}: ожидается объект вида {{\"имя\": {{\"поле\": \"значение\"}}}}")
+    built = {}
+    for name in data:
+        build(name, data, built, ())
+    profiles = loaded[path] = BUILTIN | built
+    return profiles
+
+
+def build(name: str, data: dict, built: dict, seen: tuple) -> checker.StyleProfile:
+    if name in built:
+        return built[name]
+    if name in seen:
+        raise ProfileError(f"профили наследуют друг от друга по кругу: {' -> '.join(seen + (name,))}")
+    if name not in data:
+        if name in BUILTIN:
+            return BUILTIN[name]
+        raise ProfileError(f"профиль {seen[-1]}: неизвестный base {name}")
+    spec = dict(data[name])
+    base = spec.pop("base", None)
+    unknown = sorted(set(spec) - FIELDS)
+    if len(unknown) != 0:
+        raise ProfileError(f"профиль {name}: неизвестные поля {', '.join(unknown)}; есть {', '.join(sorted(FIELDS))}")
+    for field, value in spec.items():
+        if field in TOLERANCES:
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ProfileError(f"профиль {name}: {field} должен быть неотрицательным числом")
+        elif not isinstance(value, str):
+            raise ProfileError(f"профиль {name}: {field} должен быть строкой")
+        elif field in checker.LENGTH_FIELDS and units.to_mm(value) is None:
+            raise ProfileError(f"профиль {name}: {field} = {value!r} - не длина (например, 1.25cm, 12.5mm, 14pt)")
+    parent = checker.GOST_2_105 if base is None else build(base, data, built, seen + (name,))
+    profile = built[name] = dataclasses.replace(parent, name=name, **spec)
+    return profile
+
+
+# профиль по имени; None - ГОСТ 2.105
+def get(name: str | None = None, path: str | None = None) -> checker.StyleProfile:
+    if name is None and path is None:
+        return checker.GOST_2_105
+    profiles = load(path)
+    if name is None:
+        return checker.GOST_2_105
+    if name not in profiles:
+        raise ProfileError(f"неизвестный профиль {name}; есть: {', '.join(profiles)}")
+    return profiles[name]
@@ -0,0 +1,217 @@
+import json
+import pathlib
+from dataclasses import dataclass, field
+from urllib.parse import quote
+import checker
+
+# сколько примеров текста хранится в группе
+SAMPLES = 3
+# сколько номеров элементов показывает pretty()
+POSITIONS = 10
+
+
+@dataclass
+class Group:
+    title: str
+    mask: checker.ErrorSet
+    count: int = 0
+    samples: list[str] = field(default_factory=list)
+    positions: list[int] = field(default_factory=list)
+
+    @property
+    def errors(self) -> tuple[checker.ErrorType, ...]:
+        return checker.error_kinds(self.mask)
+
+    # заголовок с числом случаев и примеры - так группа показывается в списке ошибок окна
+    @property
+    def text(self) -> str:
+        return "\n".join([self.summary()] + [f"«{excerpt(sample)}»" for sample in self.samples])
+
+    def summary(self) -> str:
+        output = f"{self.title} - случаев: {self.count}"
+        if len(self.positions) != 0:
+            shown = ", ".join(map(str, self.positions[:POSITIONS]))
+            if len(self.positions) > POSITIONS:
+                shown += ", ..."
+            output += f" (элементы {shown})"
+        return output
+
+    def pretty(self, profile: checker.StyleProfile | None = None) -> str:
+        title = self.summary()
+        output = title + '\n'
+        output += '^' * min(87, len(title)) + '\n'
+        output += 'Ошибки:\n'
+        for error in self.errors:
+            output += f"- {error.pretty(profile)}\n"
+        if len(self.samples) != 0:
+            output += 'Например:\n'
+            for sample in self.samples:
+                output += f"  {excerpt(sample)}\n"
+        return output
+
+
+def excerpt(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= 87 else text[:86] + "…"
+
+
+# Собирает ошибки в группы за один проход, ошибки можно добавлять по мере их обнаружения.
+# by="style" - одна группа на стиль элемента и набор ошибок, by="rule" - на правило и набор
+# найденных им ошибок (ошибки элемента, найденные разными правилами, попадают в разные группы).
+# Группы идут в порядке первого появления.
+class Grouper:
+    by: str
+    groups: dict[tuple, Group]
+    rules: list[tuple[str, int]]
+
+    def __init__(self, by: str = "style", rules=None):
+        self.by = by
+        self.groups = {}
+        self.rules = [(rule.name, checker.error_set(rule.kinds)._value_)
+                      for rule in (checker.DEFAULT_RULES if rules is None else rules)]
+
+    def add(self, error: checker.Error):
+        if self.by == "style":
+            self.__add(self.__style_title(error), error.mask, error)
+            return
+        rest = error.mask._value_
+        for name, kinds in self.rules:
+            if rest & kinds:
+                self.__add(f"правило {name}", checker.error_mask(rest & kinds), error)
+                rest &= ~kinds
+        if rest:
+            self.__add("прочие правила", checker.error_mask(rest), error)
+
+    def __style_title(self, error: checker.Error) -> str:
+        if error.position is None:
+            return error.text
+        if error.style is None:
+            return "элементы без стиля"
+        return f"стиль {error.style}"
+
+    def __add(self, title: str, mask: checker.ErrorSet, error: checker.Error):
+        group = self.groups.get((title, mask))
+        if group is None:
+            group = self.groups[(title, mask)] = Group(title, mask)
+        group.count += 1
+        if error.position is not None:
+            group.positions.append(error.position)
+            if len(group.samples) < SAMPLES:
+                group.samples.append(error.text)
+
+    def result(self) -> list[Group]:
+        return list(self.groups.values())
+
+
+def group_errors(errors, by: str = "style", rules=None) -> list[Group]:
+    grouper = Grouper(by, rules)
+    for error in errors:
+        grouper.add(error)
+    return grouper.result()
+
+
+# ErrorType -> имя правила, которое его находит
+def rule_names(rules=None) -> dict[checker.ErrorType, str]:
+    names = {}
+    for rule in (checker.DEFAULT_RULES if rules is None else rules):
+        for kind in rule.kinds:
+            names.setdefault(kind, rule.name)
+    return names
+
+
+# по записи на каждый ErrorType ошибки; у глобальных ошибок нет ни элемента, ни текста
+def records(path: str, error: checker.Error, rules: dict[checker.ErrorType, str],
+            profile: checker.StyleProfile | None = None):
+    text = excerpt(error.text) if error.position is not None else None
+    for kind in error.errors:
+        yield {
+            "file": path,
+            "type": kind.name,
+            "code": kind.value,
+            "rule": rules.get(kind),
+            "message": kind.pretty(profile),
+            "index": error.position,
+            "xpath": error.xpath,
+            "style": error.style,
+            "excerpt": text,
+        }
+
+
+# Машиночитаемый вывод пишется в поток сразу, как ошибки найдены: error - ошибка в файле,
+# failure - файл не удалось проверить, close - конец вывода. profile - профиль оформления проверки,
+# из него берутся требования в текстах ошибок.
+class JsonLinesWriter:
+    def __init__(self, stream, rules=None, profile: checker.StyleProfile | None = None):
+        self.stream = stream
+        self.rules = rule_names(rules)
+        self.profile = profile
+
+    def error(self, path: str, error: checker.Error):
+        for record in records(path, error, self.rules, self.profile):
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def failure(self, path: str, message: str):
+        self.stream.write(json.dumps({"file": path, "failure": message}, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+
+def artifact_uri(path: str) -> str:
+    return quote(pathlib.PurePath(path).as_posix())
+
+
+# SARIF 2.1.0: один run, правила SARIF - типы ошибок. Документ открывается в конструкторе,
+# результаты дописываются в массив results по одному, ошибки проверки файлов попадают
+# в invocations при закрытии.
+class SarifWriter:
+    def __init__(self, stream, rules=None, profile: checker.StyleProfile | None = None):
+        self.stream = stream
+        self.rules = rule_names(rules)
+        self.profile = profile
+        self.indexes = {kind: index for index, kind in enumerate(checker.ErrorType)}
+        self.failures = []
+        self.first = True
+        descriptors = [{
+            "id": kind.name,
+            "shortDescription": {"text": kind.pretty(profile)},
+            "properties": {"code": kind.value, "rule": self.rules.get(kind)},
+        } for kind in checker.ErrorType]
+        tool = {"driver": {"name": "StyleCheckerODT", "rules": descriptors}}
+        self.stream.write(f'{{"version": "2.1.0", "$schema": "{SARIF_SCHEMA}", "runs": [{{"tool": '
+                          f'{json.dumps(tool, ensure_ascii=False)}, "results": [')
+
+    def error(self, path: str, error: checker.Error):
+        for record in records(path, error, self.rules, self.profile):
+            location = {"physicalLocation": {"artifactLocation": {"uri": artifact_uri(path)}}}
+            if record["xpath"] is not None:
+                location["logicalLocations"] = [{"fullyQualifiedName": record["xpath"], "kind": "element"}]
+            result = {
+                "ruleId": record["type"],
+                "ruleIndex": self.indexes[checker.ErrorType[record["type"]]],
+                "level": "error",
+                "message": {"text": record["message"]},
+                "locations": [location],
+                "properties": {key: record[key] for key in ("code", "rule", "index", "style", "excerpt")},
+            }
+            self.stream.write(("" if self.first else ",") + "\n" + json.dumps(result, ensure_ascii=False))
+            self.first = False
+
+    def failure(self, path: str, message: str):
+        self.failures.append({
+            "level": "error",
+            "message": {"text": message},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": artifact_uri(path)}}}],
+        })
+
+    def close(self):
+        invocation = {"executionSuccessful": len(self.failures) == 0,
+                      "toolExecutionNotifications": self.failures}
+        self.stream.write(f'\n], "invocations": [{json.dumps(invocation, ensure_ascii=False)}]}}]}}\n')
+        self.stream.flush()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "sarif": SarifWriter}
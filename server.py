@@ -0,0 +1,164 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import batch
+import cache
+import checker
+import client
+import loader
+
+# больше этого документ по сети не принимается
+MAX_UPLOAD = 64 * 1024 * 1024
+# ответ на путь к файлу, который не документ: такие файлы сервер не открывает
+NOT_DOCUMENT = "Сервер проверяет только файлы .odt и .fodt."
+
+
+def dump_result(result: batch.Result) -> dict:
+    errors = cache.dump_errors(result.errors)
+    for item, error in zip(errors, result.errors):
+        item["pretty"] = error.pretty()
+    return {"path": result.path, "errors": errors, "failure": result.failure}
+
+
+# ничего не делает: первая задача заставляет пул запустить процесс заранее
+def warm_up() -> int:
+    return os.getpid()
+
+
+# Сервер проверки на localhost. Процессы пула запускаются один раз и остаются с загруженными
+# модулями, так что запрос не платит за запуск интерпретатора и импорты.
+#   GET  /health                              - {"status": "ok", "rules_version": ...}
+#   POST /check?name=file.odt&disable=a,b     - тело запроса - сам документ, ответ - один результат
+#   POST /check  {"paths": [...], "disable": [...]}  (Content-Type: application/json)
+#        - файлы на этой машине, ответ - {"results": [...], "summary": ...}, результаты в порядке
+#          путей; каталоги и шаблоны раскрывает клиент (loader.collect_files), иначе один запрос
+#          с "/**" заставил бы сервер обойти всю файловую систему
+# Запросы не проверяются на подлинность: любой процесс машины может прислать документ или попросить
+# проверить свой путь, а main.py отдаёт проверки тому, кто слушает адрес сервера. Поэтому сервер
+# читает с диска только документы (.odt, .fodt), а на машине с чужими пользователями его лучше не запускать.
+class CheckServer(ThreadingHTTPServer):
+    daemon_threads = True
+    pool: ProcessPoolExecutor
+    jobs: int
+    result_cache: cache.ResultCache | None
+
+    def __init__(self, address: tuple[str, int], jobs: int | None = None,
+                 result_cache: cache.ResultCache | None = None):
+        super().__init__(address, CheckHandler)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.result_cache = result_cache
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+        for future in [self.pool.submit(warm_up) for _ in range(self.jobs)]:
+            future.result()
+
+    def check_files(self, files: list[str], disabled: list[str]) -> list[batch.Result]:
+        check = partial(batch.check_file, cache=self.result_cache, disabled=disabled)
+        documents = [file for file in files if file.endswith(loader.EXTENSIONS)]
+        checked = dict(zip(documents, self.pool.map(check, documents)))
+        return [checked[file] if file in checked else batch.Result(file, [], NOT_DOCUMENT) for file in files]
+
+    def check_data(self, name: str, data: bytes, disabled: list[str]) -> batch.Result:
+        return self.pool.submit(batch.check_file, name, self.result_cache, False, disabled, data).result()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class CheckHandler(BaseHTTPRequestHandler):
+    server: CheckServer
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self.__reply(404, {"error": "Неизвестный адрес."})
+        self.__reply(200, {"status": "ok", "rules_version": checker.RULES_VERSION})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/check":
+            return self.__reply(404, {"error": "Неизвестный адрес."})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self.__reply(400, {"error": "Неверный заголовок Content-Length."})
+        if length > MAX_UPLOAD:
+            return self.__reply(413, {"error": "Документ слишком большой."})
+        body = self.rfile.read(length)
+
+        if self.headers.get_content_type() == "application/json":
+            try:
+                request = json.loads(body)
+                paths = list(request["paths"])
+                disabled = list(request.get("disable", []))
+            except (ValueError, KeyError, TypeError):
+                return self.__reply(400, {"error": "Неверный запрос."})
+            if not all(isinstance(path, str) for path in paths):
+                return self.__reply(400, {"error": "Неверный запрос."})
+            if any(glob.has_magic(path) or os.path.isdir(path) for path in paths):
+                return self.__reply(400, {"error": "Сервер принимает только пути к файлам, без каталогов и шаблонов."})
+            if not self.__known_rules(disabled):
+                return
+            start = time.perf_counter()
+            results = self.server.check_files(sorted(set(paths)), disabled)
+            return self.__reply(200, {
+                "results": [dump_result(result) for result in results],
+                "summary": batch.summarize(results, time.perf_counter() - start).pretty(),
+            })
+
+        query = parse_qs(url.query)
+        name = query.get("name", ["document.odt"])[0]
+        disabled = [rule for rules in query.get("disable", []) for rule in rules.split(",") if rule]
+        if not self.__known_rules(disabled):
+            return
+        self.__reply(200, dump_result(self.server.check_data(name, body, disabled)))
+
+    def __known_rules(self, disabled: list[str]) -> bool:
+        names = [rule.name for rule in checker.DEFAULT_RULES]
+        unknown = [rule for rule in disabled if rule not in names]
+        if len(unknown) != 0:
+            self.__reply(400, {"error": f"Неизвестные правила: {', '.join(unknown)}."})
+            return False
+        return True
+
+    def __reply(self, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    host, port = client.split_address(client.default_address())
+    parser = argparse.ArgumentParser(description="Сервер проверки ODT-файлов")
+    parser.add_argument("--host", default=host, help=f"адрес (по умолчанию {host})")
+    parser.add_argument("--port", type=int, default=port, help=f"порт (по умолчанию {port})")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="число процессов проверки (по умолчанию - число ядер)")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать сохранённые результаты проверок")
+    args = parser.parse_args()
+
+    server = CheckServer((args.host, args.port), args.jobs, None if args.no_cache else cache.ResultCache())
+    print(f"Сервер проверки слушает {args.host}:{args.port}, процессов: {server.jobs}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+import batch
+import checker
+
+# Результаты пакетных проверок в SQLite, чтобы отвечать на вопросы по всему корпусу работ
+# (какие ошибки чаще всего, у каких файлов стало хуже), не открывая сами документы.
+#   runs      - запуски проверки
+#   files     - файлы запуска: путь, хеш содержимого, число ошибок или причина неудачи
+#   documents - проверенное содержимое (по хешу), правила и профиль оформления, с которыми оно проверено
+#   findings  - ошибки: хеш, код ErrorType, номер элемента (0 - глобальная ошибка документа) и
+#               число таких ошибок у элемента (у абзаца с несколькими рисунками их несколько)
+#   counts    - число ошибок каждого типа в документе, для быстрых сводок
+# Одно и то же содержимое хранится один раз, сколько бы запусков его ни проверяли; если его
+# проверили другими правилами или по другому профилю, ошибки заменяются последними.
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    rules_version INTEGER NOT NULL,
+    disabled TEXT NOT NULL,
+    profile TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    path TEXT NOT NULL,
+    hash TEXT,
+    failure TEXT,
+    findings INTEGER NOT NULL,
+    PRIMARY KEY (run, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_path ON files(path, run);
+CREATE INDEX IF NOT EXISTS files_hash ON files(hash);
+CREATE TABLE IF NOT EXISTS documents (
+    hash TEXT PRIMARY KEY,
+    rules_version INTEGER NOT NULL,
+    disabled TEXT NOT NULL,
+    findings INTEGER NOT NULL,
+    profile TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS findings (
+    hash TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    xpath TEXT,
+    style TEXT,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hash, code, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS findings_code ON findings(code);
+CREATE TABLE IF NOT EXISTS counts (
+    hash TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hash, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_code ON counts(code, count);
+"""
+
+# версия -> как перейти от неё к следующей.
+# До версии 2 профиль не записывался, и все проверки были по ГОСТ 2.105. До версии 3 повторные
+# ошибки одного элемента терялись; такие документы перезапишутся при следующей проверке.
+MIGRATIONS = {
+    1: f"""
+ALTER TABLE runs ADD COLUMN profile TEXT NOT NULL DEFAULT '{checker.GOST_2_105.name}';
+ALTER TABLE documents ADD COLUMN profile TEXT NOT NULL DEFAULT '{checker.GOST_2_105.name}';
+""",
+    2: """
+ALTER TABLE findings ADD COLUMN count INTEGER NOT NULL DEFAULT 1;
+UPDATE documents SET rules_version = 0;
+""",
+}
+
+# последняя проверка каждого пути и предыдущая проверка по тому же профилю
+HISTORY = """
+WITH history AS (
+    SELECT path, run, hash, failure, findings,
+           LAG(hash) OVER previous AS previous_hash,
+           LAG(findings) OVER previous AS previous_findings,
+           LAG(failure) OVER previous AS previous_failure,
+           ROW_NUMBER() OVER (PARTITION BY path ORDER BY run DESC) AS age
+    FROM files JOIN runs ON runs.id = files.run
+    WINDOW previous AS (PARTITION BY path, profile ORDER BY run)
+)
+"""
+
+
+def default_path() -> str:
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "stylechecker", "results.sqlite")
+
+
+class ResultStore:
+    path: str
+    connection: sqlite3.Connection
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                while version in MIGRATIONS:
+                    self.connection.executescript(MIGRATIONS[version])
+                    version += 1
+                self.connection.executescript(SCHEMA)
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # результаты одного запуска (batch.Result) - одной транзакцией; у результата без digest
+    # хеш файла считается здесь; profile - имя профиля оформления (None - ГОСТ 2.105)
+    def add_run(self, results, disabled=(), started: float | None = None, profile: str | None = None) -> int:
+        disabled = ",".join(sorted(disabled))
+        profile = profile or checker.GOST_2_105.name
+        files = []
+        findings = []
+        counts = []
+        documents = []
+        for result in results:
+            digest = result.digest or batch.file_digest(result.path)
+            total = sum(len(error.errors) for error in result.errors)
+            files.append((os.path.abspath(result.path), digest, result.failure, total))
+            if digest is None or result.failure is not None:
+                continue
+            documents.append((digest, total, result.errors))
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started, rules_version, disabled, profile) VALUES (?, ?, ?, ?)",
+                (time.time() if started is None else started, checker.RULES_VERSION, disabled, profile))
+            run = cursor.lastrowid
+            self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                        [(run,) + file for file in files])
+            for digest, total, errors in documents:
+                known = self.connection.execute("SELECT rules_version, disabled, profile FROM documents WHERE hash = ?",
+                                                (digest,)).fetchone()
+                if known == (checker.RULES_VERSION, disabled, profile):
+                    continue
+                if known is not None:
+                    self.connection.execute("DELETE FROM findings WHERE hash = ?", (digest,))
+                    self.connection.execute("DELETE FROM counts WHERE hash = ?", (digest,))
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO documents (hash, rules_version, disabled, findings, profile)"
+                    " VALUES (?, ?, ?, ?, ?)", (digest, checker.RULES_VERSION, disabled, total, profile))
+                number = {}
+                found = {}
+                for error in errors:
+                    for kind in error.errors:
+                        key = (kind.value, error.position or 0)
+                        if key in found:
+                            found[key][2] += 1
+                        else:
+                            found[key] = [error.xpath, error.style, 1]
+                        number[kind.value] = number.get(kind.value, 0) + 1
+                findings += [(digest, code, position, xpath, style, count)
+                             for (code, position), (xpath, style, count) in found.items()]
+                counts += [(digest, code, count) for code, count in number.items()]
+            self.connection.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?)", findings)
+            self.connection.executemany("INSERT INTO counts VALUES (?, ?, ?)", counts)
+        return run
+
+    # (номер, время, файлов, с ошибками, не удалось проверить)
+    def runs(self) -> list[tuple]:
+        return self.connection.execute("""
+            SELECT run, started, COUNT(*), SUM(findings > 0), SUM(failure IS NOT NULL)
+            FROM files JOIN runs ON runs.id = files.run
+            GROUP BY run ORDER BY run
+        """).fetchall()
+
+    # (ErrorType, случаев, документов) по документам, проверенным в [since, until)
+    def types(self, since: float | None = None, until: float | None = None) -> list[tuple]:
+        rows = self.connection.execute("""
+            SELECT code, SUM(count), COUNT(*) FROM counts
+            WHERE hash IN (SELECT DISTINCT hash FROM files JOIN runs ON runs.id = files.run
+                           WHERE started >= ? AND started < ?)
+            GROUP BY code ORDER BY 2 DESC
+        """, (since if since is not None else float("-inf"), until if until is not None else float("inf")))
+        return [(checker.ErrorType(code), total, documents) for code, total, documents in rows]
+
+    # (путь, ошибок было, ошибок стало, новые ErrorType) у файлов, последняя проверка которых
+    # нашла больше ошибок, чем предыдущая по тому же профилю оформления
+    def regressions(self) -> list[tuple]:
+        rows = self.connection.execute(HISTORY + """
+            SELECT path, previous_findings, findings, hash, previous_hash FROM history
+            WHERE age = 1 AND failure IS NULL AND previous_failure IS NULL
+                  AND previous_hash IS NOT NULL AND findings > previous_findings
+            ORDER BY findings - previous_findings DESC, path
+        """).fetchall()
+        output = []
+        for path, before, after, digest, previous in rows:
+            new = self.connection.execute("""
+                SELECT code FROM counts WHERE hash = ?
+                EXCEPT SELECT code FROM counts WHERE hash = ?
+            """, (digest, previous)).fetchall()
+            output.append((path, before, after, [checker.ErrorType(code) for (code,) in sorted(new)]))
+        return output
+
+    # (путь, случаев) - файлы, в последней проверке которых есть ошибка kind
+    def files_with(self, kind: checker.ErrorType, limit: int = 20) -> list[tuple]:
+        return self.connection.execute(HISTORY + """
+            SELECT path, count FROM history JOIN counts ON counts.hash = history.hash
+            WHERE age = 1 AND code = ?
+            ORDER BY count DESC, path LIMIT ?
+        """, (kind.value, limit)).fetchall()
+
+    # (время, ошибок, причина неудачи) по всем проверкам пути
+    def history(self, path: str) -> list[tuple]:
+        return self.connection.execute("""
+            SELECT started, findings, failure FROM files JOIN runs ON runs.id = files.run
+            WHERE path = ? ORDER BY run
+        """, (os.path.abspath(path),)).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def moment(seconds: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(seconds))
+
+
+def date(text: str) -> float:
+    return time.mktime(datetime.date.fromisoformat(text).timetuple())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запросы к сохранённым результатам проверок (main.py --store)")
+    parser.add_argument("--db", default=None, help=f"файл базы (по умолчанию {default_path()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="запуски проверки")
+    types = commands.add_parser("types", help="самые частые ошибки")
+    types.add_argument("--since", type=date, default=None, help="с даты (ГГГГ-ММ-ДД)")
+    types.add_argument("--until", type=date, default=None, help="до даты, не включая её")
+    commands.add_parser("regressions", help="файлы, у которых ошибок стало больше, чем в прошлый раз")
+    by_type = commands.add_parser("type", help="файлы с ошибкой данного типа")
+    by_type.add_argument("name", choices=[kind.name for kind in checker.ErrorType], metavar="ТИП")
+    by_type.add_argument("--limit", type=int, default=20)
+    history = commands.add_parser("file", help="все проверки файла")
+    history.add_argument("path")
+    args = parser.parse_args()
+
+    if args.db is None and not os.path.exists(default_path()):
+        print("Сохранённых результатов нет: запустите проверку с --store", file=sys.stderr)
+        return
+    with ResultStore(args.db) as store:
+        match args.command:
+            case "runs":
+                print(f"{'Запуск':<8}{'время':<18}{'файлов':>8}{'с ошибками':>12}{'не удалось':>12}")
+                for run, started, files, with_errors, failed in store.runs():
+                    print(f"{run:<8}{moment(started):<18}{files:>8}{with_errors:>12}{failed:>12}")
+            case "types":
+                print(f"{'Ошибка':<28}{'код':>5}{'случаев':>10}{'документов':>12}")
+                for kind, total, documents in store.types(args.since, args.until):
+                    print(f"{kind.name:<28}{kind.value:>5}{total:>10}{documents:>12}")
+            case "regressions":
+                for path, before, after, new in store.regressions():
+                    print(f"{path}: {before} -> {after}" + (f", новые: {', '.join(kind.name for kind in new)}"
+                                                            if len(new) != 0 else ""))
+            case "type":
+                for path, count in store.files_with(checker.ErrorType[args.name], args.limit):
+                    print(f"{count:>6}  {path}")
+            case "file":
+                for started, findings, failure in store.history(args.path):
+                    print(f"{moment(started)}  " + (failure if failure is not None else f"ошибок: {findings}"))
+
+
+if __name__ == "__main__":
+    main()
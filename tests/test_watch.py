@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+import watch
+from benchmarks.generate import generate
+
+
+class WatcherPollTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "work.odt")
+        self.document = generate(1)
+        self.write(self.document)
+        self.watcher = watch.Watcher(self.path)
+
+    # новая метка времени, чтобы опрос увидел изменение даже при грубом mtime
+    def write(self, data: bytes):
+        with open(self.path, "wb") as file:
+            file.write(data)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_empty_file_during_save_is_retried(self):
+        first = self.watcher.poll()
+        self.assertIsNotNone(first)
+        self.assertTrue(first.first)
+
+        self.write(b"")
+        self.assertIsNone(self.watcher.poll())
+        # недописанный файл не запоминается: следующий опрос проверит его снова
+        self.assertIsNone(self.watcher.poll())
+
+        self.write(self.document)
+        second = self.watcher.poll()
+        self.assertIsNotNone(second)
+        self.assertFalse(second.first)
+        self.assertEqual(second.added, [])
+        self.assertEqual(second.resolved, [])
+
+    def test_unreadable_file_is_retried(self):
+        self.assertIsNotNone(self.watcher.poll())
+        # на месте файла на миг оказывается не файл: открыть его нельзя (OSError)
+        os.remove(self.path)
+        os.mkdir(self.path)
+        self.assertIsNone(self.watcher.poll())
+        os.rmdir(self.path)
+        self.write(self.document)
+        self.assertIsNotNone(self.watcher.poll())
+
+
+if __name__ == "__main__":
+    unittest.main()
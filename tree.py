@@ -0,0 +1,22 @@
+import xml.etree.ElementTree as ET
+from anytree import NodeMixin
+from checker import local_name
+
+# Документ целиком в дереве anytree - для движка StyleChecker(streaming=False).
+# Потоковый движок обходится без него, так что anytree загружается только при первой такой проверке.
+
+
+class Elem_xml_tree(ET.Element, NodeMixin):
+    def __init__(self, xml_elem: ET.Element, parent=None, children=None):
+        super(Elem_xml_tree).__init__()
+        self.tag = local_name(xml_elem.tag)
+        self.xml_elem = xml_elem
+        self.facts = None
+        self.parent = parent
+        if children:
+            self.children = children
+
+def load_children(parent: Elem_xml_tree, elem_xml: ET.Element):
+    for elem in list(elem_xml):
+        children = Elem_xml_tree(elem, parent=parent)
+        load_children(children, elem)
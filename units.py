@@ -0,0 +1,27 @@
+import re
+
+# длины ODF и SVG (fo:page-width="21cm", svg:width="120mm", width="640") в миллиметрах
+MM = {
+    "mm": 1.0,
+    "cm": 10.0,
+    "in": 25.4,
+    "pt": 25.4 / 72,
+    "pc": 25.4 / 6,
+    "px": 25.4 / 96,
+}
+
+LENGTH = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z]*)\s*")
+
+
+# None - не длина или длина в процентах; число без единиц - пиксели, как в SVG и CSS
+def to_mm(value: str | None) -> float | None:
+    if value is None:
+        return None
+    match = LENGTH.fullmatch(value)
+    if match is None:
+        return None
+    number, unit = match.groups()
+    scale = MM.get(unit or "px")
+    if scale is None:
+        return None
+    return float(number) * scale
@@ -0,0 +1,110 @@
+import os
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass
+import checker
+import loader
+
+# как часто смотреть на файл, с
+INTERVAL = 0.5
+
+
+def error_key(error: checker.Error) -> tuple:
+    return (error.text, error.mask)
+
+
+# ошибки, появившиеся в new и исчезнувшие из old; одинаковые ошибки считаются поштучно
+def diff_errors(old: list[checker.Error], new: list[checker.Error]) -> tuple[list[checker.Error], list[checker.Error]]:
+    before = Counter(map(error_key, old))
+    after = Counter(map(error_key, new))
+    added = []
+    for error in new:
+        key = error_key(error)
+        if after[key] > before[key]:
+            after[key] -= 1
+            added.append(error)
+    after = Counter(map(error_key, new))
+    resolved = []
+    for error in old:
+        key = error_key(error)
+        if before[key] > after[key]:
+            before[key] -= 1
+            resolved.append(error)
+    return added, resolved
+
+
+@dataclass
+class Change:
+    first: bool
+    errors: list[checker.Error]
+    added: list[checker.Error]
+    resolved: list[checker.Error]
+    reused: int
+    checked: int
+
+
+# Повторная проверка одного документа после каждого сохранения. Между проверками хранит
+# checker.Incremental, так что заново проверяются только изменившиеся элементы.
+class Watcher:
+    path: str
+    disabled: list[str]
+    style_profile: checker.StyleProfile | None
+    incremental: checker.Incremental
+    errors: list[checker.Error] | None
+    stamp: tuple | None
+
+    def __init__(self, path: str, disabled=(), style_profile: checker.StyleProfile | None = None):
+        self.path = path
+        self.disabled = list(disabled)
+        self.style_profile = style_profile
+        self.incremental = checker.Incremental()
+        self.errors = None
+        self.stamp = None
+
+    # новая метка файла, если он изменился с прошлой проверки, иначе None
+    def modified(self) -> tuple | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # редактор сохраняет во временный файл и переименовывает его
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        return None if stamp == self.stamp else stamp
+
+    # None, если файл не менялся с прошлого вызова или ещё не дописан
+    def poll(self) -> Change | None:
+        stamp = self.modified()
+        if stamp is None:
+            return None
+        # файл ещё сохраняется: пустой или недописанный, или редактор как раз подменяет его новым
+        try:
+            change = self.check()
+        except (zipfile.BadZipFile, loader.NotDocument, loader.MissingPart, EOFError, ET.ParseError, OSError):
+            return None
+        self.stamp = stamp
+        return change
+
+    def check(self) -> Change:
+        return self.finish(self.new_check().run())
+
+    # проверка, которая помнит прошлую; её ошибки передаются в finish
+    def new_check(self, progress=None, cancelled=None) -> checker.StyleChecker:
+        return checker.StyleChecker(self.path, streaming=True, progress=progress, cancelled=cancelled,
+                                    disabled=self.disabled, incremental=self.incremental,
+                                    style_profile=self.style_profile)
+
+    def finish(self, errors: list[checker.Error]) -> Change:
+        first = self.errors is None
+        added, resolved = diff_errors(self.errors or [], errors)
+        self.errors = errors
+        return Change(first, errors, added, resolved, self.incremental.reused, self.incremental.checked)
+
+
+def watch(watcher: Watcher, changed, interval: float = INTERVAL):
+    while True:
+        change = watcher.poll()
+        if change is not None:
+            changed(change)
+        time.sleep(interval)
@@ -1,5 +1,7 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QApplication, QMessageBox, QLabel, QDialogButtonBox
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QRect, QSize
+from PyQt5.QtWidgets import QApplication, QMessageBox, QLabel, QDialogButtonBox, \
+    QStyledItemDelegate, QStyle, QTreeView
+import checker
 
 # это костыли, но более простого способа поставить кнопку в центр не нашлось.
 # Инет говорит, что обычно расположение кнопок зависит от системного стиля
@@ -21,4 +23,115 @@ class CenteredMessageBox(QMessageBox):
         grid_layout.removeWidget(qt_msgbox_buttonbox)
 
         grid_layout.addWidget(qt_msgbox_label, 0, 0, alignment=Qt.AlignCenter)
-        grid_layout.addWidget(qt_msgbox_buttonbox, 1, 0, alignment=Qt.AlignCenter)
\ No newline at end of file
+        grid_layout.addWidget(qt_msgbox_buttonbox, 1, 0, alignment=Qt.AlignCenter)
+
+# Список ошибок для QTreeView: строки создаются видом по мере прокрутки, а не заранее,
+# как QTreeWidgetItem с QLabel на каждую строку. Верхний уровень - места в тексте,
+# дочерние строки - описания ошибок, они запрашиваются только при раскрытии.
+class ErrorModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.errors = []
+        self.visible = []
+        self.rows = {}
+        self.kind = None
+        self.header = "Файл не выбран"
+
+    def setHeader(self, text: str):
+        self.header = text
+        self.headerDataChanged.emit(Qt.Horizontal, 0, 0)
+
+    def clear(self):
+        self.beginResetModel()
+        self.errors = []
+        self.visible = []
+        self.rows = {}
+        self.endResetModel()
+
+    # заменить весь список, например ошибками, собранными в группы (report.Group)
+    def reset(self, errors: list):
+        self.beginResetModel()
+        self.errors = list(errors)
+        self.visible = [error for error in self.errors if self.kind is None or self.kind in error.errors]
+        self.rows = {id(error): row for row, error in enumerate(self.visible)}
+        self.endResetModel()
+
+    def append(self, error: checker.Error):
+        self.errors.append(error)
+        if self.kind is None or self.kind in error.errors:
+            row = len(self.visible)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.visible.append(error)
+            self.rows[id(error)] = row
+            self.endInsertRows()
+
+    # kind=None - показывать все ошибки
+    def setFilter(self, kind: checker.ErrorType | None):
+        self.beginResetModel()
+        self.kind = kind
+        self.visible = [error for error in self.errors if kind is None or kind in error.errors]
+        self.rows = {id(error): row for row, error in enumerate(self.visible)}
+        self.endResetModel()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, None)
+        return self.createIndex(row, column, self.visible[parent.row()])
+
+    def parent(self, index):
+        if not index.isValid() or index.internalPointer() is None:
+            return QModelIndex()
+        return self.createIndex(self.rows[id(index.internalPointer())], 0, None)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.visible)
+        if parent.internalPointer() is None:
+            return len(self.visible[parent.row()].errors)
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        return not parent.isValid() or parent.internalPointer() is None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        error = index.internalPointer()
+        if error is None:
+            return self.visible[index.row()].text
+        return error.errors[index.row()].pretty()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.header
+        return None
+
+
+# переносит длинные строки по словам, высота строки считается по ширине окна просмотра
+class WordWrapDelegate(QStyledItemDelegate):
+    def __init__(self, view: QTreeView):
+        super().__init__(view)
+        self.view = view
+
+    def sizeHint(self, option, index):
+        depth = 0 if not index.parent().isValid() else 1
+        width = self.view.viewport().width() - self.view.indentation() * (depth + 1) - 4
+        rect = option.fontMetrics.boundingRect(QRect(0, 0, max(width, 1), 0), Qt.TextWordWrap, index.data())
+        return QSize(rect.width(), rect.height() + 4)
+
+    def paint(self, painter, option, index):
+        self.initStyleOption(option, index)
+        text = option.text
+        option.text = ""
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, option, painter, option.widget)
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.setPen(option.palette.highlightedText().color())
+        painter.drawText(option.rect.adjusted(2, 2, -2, -2), Qt.TextWordWrap, text)
+        painter.restore()